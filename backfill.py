@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historical backfill of a group's message history
+
+Pages backwards through get_group_msg_history from the newest message (or
+from the checkpoint of an interrupted run) until a date or message limit,
+and feeds the messages through the normal dedup/extract/store path in
+chunks of BACKFILL_CHUNK_SIZE. The checkpoint only moves after a chunk is
+committed with every extraction successful, so an interrupted backfill, or
+one whose LLM calls failed, resumes without losing messages.
+
+Usage:
+    python backfill.py --since 2026-09-01
+    python backfill.py --groups 534116547 --max-messages 20000 --rate 1
+    python backfill.py --groups 534116547 --restart
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import metrics
+from datebase import init_database, session, get_cursor, set_cursor, get_backfill, set_backfill
+from loadconfig import load_config
+from segments import SegmentParser
+from simple_qq_parser import get_group_messages, iter_text_messages, message_seq_of
+from work import commit_records
+
+
+class RateLimiter:
+    """Space requests at least 1/rate seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self.next_time:
+            time.sleep(self.next_time - now)
+        self.next_time = max(now, self.next_time) + self.interval
+
+
+def backfill_group(group_id, config, since=None, max_messages=0, restart=False, limiter=None, parser=None):
+    """
+    Backfill one group, resuming from its checkpoint
+
+    Args:
+        group_id: Group ID
+        config: Configuration dictionary
+        since: Stop at messages older than this datetime (None for no date limit)
+        max_messages: Stop this run after this many fetched messages (0 for no limit)
+        restart: Ignore the checkpoint and start again from the newest message
+        limiter: RateLimiter shared by all groups
+        parser: SegmentParser shared by all groups
+
+    Returns:
+        (processed, stored, failed): fetched messages, stored records and failed extractions of this run
+    """
+    limiter = limiter or RateLimiter(config.get('backfill_rate', 2.0))
+    parser = parser or SegmentParser(config)
+    page_size = config.get('backfill_page_size', 100)
+    chunk_size = config.get('backfill_chunk_size', 1000)
+    since_time = since.timestamp() if since else None
+
+    with session():
+        checkpoint = get_backfill(group_id)
+    if checkpoint and checkpoint[2] and not restart:
+        print(f"Group {group_id}: backfill already finished ({checkpoint[1]} messages), use --restart to run again")
+        return 0, 0, 0
+    if checkpoint and not restart:
+        next_seq, processed = checkpoint[0], checkpoint[1]
+        print(f"Group {group_id}: resuming backfill before seq {next_seq} ({processed} messages done)")
+    else:
+        next_seq, processed = None, 0
+
+    stored = 0
+    failed = 0
+    pending = []
+    # Oldest seq of the pending pages, becomes the checkpoint once they are committed
+    pending_seq = next_seq
+    first_failed = {}
+    done = False
+    start_processed = processed
+
+    def commit():
+        """Store the pending chunk, move the checkpoint past it only if no extraction failed"""
+        nonlocal pending, stored, failed
+        stored += commit_records(group_id, pending, config, first_failed)
+        pending = []
+        if group_id in first_failed:
+            # Like advance_cursor: the checkpoint stays before the failed messages
+            failed += 1
+            first_failed.clear()
+            return False
+        with session():
+            set_backfill(group_id, pending_seq, processed, done)
+        return True
+
+    while True:
+        limiter.wait()
+        response = get_group_messages(group_id, page_size, config, message_seq=next_seq if next_seq is not None else "")
+        if not response or response.get('status') != 'ok':
+            print(f"Group {group_id}: fetching before seq {next_seq} failed, run again to resume")
+            if pending:
+                commit()
+            break
+        page = response.get('data', {}).get('messages', [])
+
+        if next_seq is None and page:
+            # A group that was never processed continues from here in the nightly job
+            with session():
+                if get_cursor(group_id) is None:
+                    newest = max(page, key=message_seq_of)
+                    set_cursor(group_id, message_seq_of(newest), newest.get('message_id'))
+
+        # Pages overlap by one message
+        page = [message for message in page if next_seq is None or message_seq_of(message) < next_seq]
+        if since_time is not None:
+            reached = any(message.get('time', 0) < since_time for message in page)
+            page = [message for message in page if message.get('time', 0) >= since_time]
+        else:
+            reached = False
+        if max_messages:
+            page = sorted(page, key=message_seq_of)[-(max_messages - (processed - start_processed)):]
+
+        if page:
+            processed += len(page)
+            next_seq = min(message_seq_of(message) for message in page)
+            pending_seq = next_seq
+            with metrics.timer('parse', group_id=group_id) as run:
+                records = list(iter_text_messages(sorted(page, key=message_seq_of), group_id, parser))
+                run['items'] = len(records)
+            pending.extend(records)
+
+        # Reached the date limit or the beginning of the history
+        done = not page or reached or len(response['data'].get('messages', [])) < page_size
+        # The message limit only ends this run, the next run continues from the checkpoint
+        limit_reached = max_messages and processed - start_processed >= max_messages
+        if done or limit_reached or len(pending) >= chunk_size:
+            if not commit():
+                print(f"Group {group_id}: extraction failed, checkpoint kept, run again to retry the last chunk")
+                break
+            print(f"Group {group_id}: {processed} messages backfilled, {stored} records stored, next seq {next_seq}")
+        if done or limit_reached:
+            break
+
+    return processed - start_processed, stored, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the message history of QQ groups")
+    parser.add_argument('--groups', help="Comma-separated group IDs, default GROUP_IDS")
+    parser.add_argument('--since', help="Oldest message date to fetch, YYYY-MM-DD")
+    parser.add_argument('--max-messages', type=int, default=0, help="Messages per group, 0 for no limit")
+    parser.add_argument('--rate', type=float, help="NapCat requests per second, default BACKFILL_RATE")
+    parser.add_argument('--restart', action='store_true', help="Ignore checkpoints and start from the newest message")
+    args = parser.parse_args()
+
+    config = load_config()
+    if config is None:
+        print("Config error, cannot start")
+        return
+    if args.since is None and not args.max_messages:
+        print("Warning: no --since or --max-messages, backfilling the whole history")
+    init_database()
+    metrics.configure(config)
+
+    group_ids = [group_id.strip() for group_id in args.groups.split(',')] if args.groups else \
+        [group['group_id'] for group in config.get('groups', [])]
+    since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+    limiter = RateLimiter(args.rate if args.rate is not None else config.get('backfill_rate', 2.0))
+    parser = SegmentParser(config)
+
+    total_processed = total_stored = 0
+    for group_id in group_ids:
+        processed, stored, failed = backfill_group(group_id, config, since, args.max_messages, args.restart, limiter, parser)
+        total_processed += processed
+        total_stored += stored
+    print(f"Backfill finished: {total_processed} messages, {total_stored} records stored")
+    metrics.write_prometheus()
+
+
+if __name__ == "__main__":
+    main()
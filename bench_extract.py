@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark local extraction modes and backends on the historical message set
+
+Every message the LLM answered with a time in earlier runs (output/ files
+and qq.db, see prefilter.load_history) is extracted again in each mode of
+the GPU model (local) and with the CPU model (llama_cpp) at each thread
+count. Accuracy is agreement with the historical answer; latency is wall
+time per message.
+
+Usage:
+    python bench_extract.py --modes think,nothink,budget,constrained --batch-size 1
+    python bench_extract.py --backends local,llama_cpp --modes nothink --llama-threads 2,4,8 --batch-size 8
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import llm
+from loadconfig import load_config
+from prefilter import load_history
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def same_dates(answer, label):
+    """Compare only the MM:DD parts, order-insensitive"""
+    if answer is None:
+        return False
+    return {part[:5] for part in answer.split('-')} == {part[:5] for part in label.split('-')}
+
+
+def run_mode(samples, label, extract, batch_size):
+    """Extract all samples in batches with extract(batch) -> answers"""
+    messages = list(samples)
+    latencies = []
+    answers = []
+    start = time.time()
+    for offset in range(0, len(messages), batch_size):
+        batch = messages[offset:offset + batch_size]
+        batch_start = time.time()
+        answers.extend(extract(batch))
+        # Every message of a batch waits for the whole batch
+        latencies.extend([time.time() - batch_start] * len(batch))
+    total = time.time() - start
+
+    exact = sum(answer == samples[message] for message, answer in zip(messages, answers))
+    dates = sum(same_dates(answer, samples[message]) for message, answer in zip(messages, answers))
+    return {
+        'mode': label,
+        'messages': len(messages),
+        'batch_size': batch_size,
+        'total_seconds': round(total, 3),
+        'messages_per_second': round(len(messages) / total, 3) if total else 0.0,
+        'latency_mean': round(statistics.mean(latencies), 3) if latencies else 0.0,
+        'latency_p50': round(percentile(latencies, 50), 3),
+        'latency_p99': round(percentile(latencies, 99), 3),
+        'exact_match': round(exact / len(messages), 4) if messages else 0.0,
+        'same_dates': round(dates / len(messages), 4) if messages else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local extraction modes and backends")
+    parser.add_argument('--backends', default='local', help="Comma-separated: local, llama_cpp")
+    parser.add_argument('--modes', help="Modes of the local backend, default all")
+    parser.add_argument('--llama-threads', default='0', help="Thread counts to try with llama_cpp, 0 for automatic")
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--limit', type=int, default=0, help="Only use the first N messages")
+    parser.add_argument('--output', default='bench_extract.json')
+    args = parser.parse_args()
+
+    samples = load_history()
+    if args.limit:
+        samples = dict(list(samples.items())[:args.limit])
+    print(f"Benchmarking on {len(samples)} historical messages")
+    config = load_config() or {}
+
+    reports = []
+    for backend_name in [name.strip() for name in args.backends.split(',')]:
+        backend = llm.get_backend(backend_name)
+        if backend_name == 'local':
+            runs = [(mode.strip(), lambda batch, mode=mode.strip(): backend.extract_time_info_batch_local(batch, args.batch_size, mode))
+                    for mode in (args.modes or ','.join(backend.EXTRACT_MODES)).split(',')]
+        elif backend_name == 'llama_cpp':
+            runs = []
+            for threads in args.llama_threads.split(','):
+                run_config = dict(config, llama_threads=int(threads))
+                label = f"llama_cpp/{backend.cpu_threads(run_config)[0]}t"
+                runs.append((label, lambda batch, run_config=run_config: backend.extract_time_info_batch_cpu(batch, run_config, args.batch_size)))
+        else:
+            runs = [(backend_name, lambda batch: backend.extract_batch(batch, dict(config, batch_size=args.batch_size)))]
+
+        for label, extract in runs:
+            # Load the model and warm up (CUDA initialization) outside the measured time
+            extract(["收到"])
+            report = run_mode(samples, label, extract, args.batch_size)
+            reports.append(report)
+            print(json.dumps(report, ensure_ascii=False))
+        backend.unload()
+
+    print(f"\n{'mode':<16}{'msg/s':>8}{'p50 s':>8}{'p99 s':>8}{'exact':>8}{'dates':>8}")
+    for report in reports:
+        print(f"{report['mode']:<16}{report['messages_per_second']:>8}{report['latency_p50']:>8}"
+              f"{report['latency_p99']:>8}{report['exact_match']:>8.1%}{report['same_dates']:>8.1%}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': int(time.time()), 'reports': reports}, f, ensure_ascii=False, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
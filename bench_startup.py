@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup time and idle memory of each extraction backend
+
+Every run is a fresh interpreter that imports the scheduler's modules
+(main.py) and selects one backend through llm.get_backend, as the first
+extraction of a run does. It reports wall time to that point, resident
+memory afterwards and which heavy modules ended up imported. No model is
+loaded, so this is what a deployment pays before doing any work.
+
+Usage:
+    python bench_startup.py --backends api,local --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import llm
+
+# Modules whose presence marks the GPU/CPU inference stack
+HEAVY_MODULES = ('torch', 'transformers', 'llama_cpp')
+
+# Runs in the child interpreter; {backend} and {heavy} are filled in by measure()
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import main, llm
+backend = {backend!r}
+if backend:
+    llm.get_backend(backend)
+seconds = time.perf_counter() - start
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) * 1024
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'seconds': seconds, 'rss': rss, 'heavy': heavy}}))
+'''
+
+
+def measure(backend):
+    """Import time and RSS of one fresh interpreter, None if the backend cannot be imported"""
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD.format(backend=backend, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        print(f"{backend or 'none'}: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_backend(backend, repeat):
+    runs = [measure(backend) for _ in range(repeat)]
+    if any(run is None for run in runs):
+        return None
+    return {
+        'backend': backend or 'none',
+        'runs': repeat,
+        'startup_seconds_p50': round(statistics.median(run['seconds'] for run in runs), 3),
+        'startup_seconds_max': round(max(run['seconds'] for run in runs), 3),
+        'rss_mb': round(statistics.median(run['rss'] for run in runs) / 2 ** 20, 1),
+        'heavy_modules': runs[0]['heavy'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup time and idle RSS per extraction backend")
+    parser.add_argument('--backends', default=','.join(llm.BACKENDS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_startup.json')
+    args = parser.parse_args()
+
+    reports = []
+    # Baseline: the scheduler without any backend imported
+    for backend in [''] + [name.strip() for name in args.backends.split(',')]:
+        report = run_backend(backend, args.repeat)
+        if report is not None:
+            reports.append(report)
+            print(json.dumps(report, ensure_ascii=False))
+
+    print(f"\n{'backend':<12}{'start s':>10}{'max s':>10}{'RSS MB':>10}  heavy modules")
+    for report in reports:
+        print(f"{report['backend']:<12}{report['startup_seconds_p50']:>10}{report['startup_seconds_max']:>10}"
+              f"{report['rss_mb']:>10}  {', '.join(report['heavy_modules']) or '-'}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': int(time.time()), 'reports': reports}, f, ensure_ascii=False, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
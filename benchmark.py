@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the ingest -> extract -> store -> send pipeline
+
+Runs work.work() and send.check_all() in a scratch directory against a local
+mock NapCat (mock_napcat.py) and a mock OpenAI-compatible LLM (mock_llm.py),
+and reports throughput and p50/p99 latency of every stage from the run's
+metrics log (METRICS_JSONL). Results are written to a JSON file so
+regressions can be tracked across commits.
+
+Usage:
+    python benchmark.py --messages 10000 --groups 4 --llm-latency 0.5
+    python benchmark.py --messages 1000000 --groups 10 --output bench/1m.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import datebase
+import extract_cache
+import llm_api
+import mock_llm
+import mock_napcat
+
+# Stage name -> list of (seconds, items) per call
+samples = {}
+samples_lock = threading.Lock()
+
+
+def record(stage, seconds, items):
+    with samples_lock:
+        samples.setdefault(stage, []).append((seconds, items))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize():
+    """Per-stage totals, throughput (items/s) and per-call latency percentiles"""
+    report = {}
+    for stage, calls in samples.items():
+        seconds = [duration for duration, items in calls]
+        items = sum(items for duration, items in calls)
+        total = sum(seconds)
+        report[stage] = {
+            'calls': len(calls),
+            'items': items,
+            'total_seconds': round(total, 4),
+            'items_per_second': round(items / total, 1) if total else None,
+            'p50_ms': round(percentile(seconds, 50) * 1000, 3),
+            'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+        }
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def configure(workdir, args, napcat_port, llm_port, group_ids):
+    """Point config.env, the database and the cache at the scratch directory"""
+    settings = {
+        'TOKEN': 'benchmark',
+        'GROUP_IDS': ','.join(group_ids),
+        'BASE_URL': f'http://127.0.0.1:{napcat_port}',
+        'MESSAGE_COUNT': str(args.page_size),
+        'FETCH_PAGE_SIZE': str(args.page_size),
+        # Enough pages to catch up the whole synthetic history
+        'MAX_FETCH_PAGES': str(args.messages // max(1, len(group_ids)) // args.page_size + 2),
+        'FETCH_CONCURRENCY': str(args.fetch_concurrency),
+        'API_CONCURRENCY': str(args.api_concurrency),
+        'BATCH_SIZE': str(args.batch_size),
+        'PREFILTER': 'false' if args.no_prefilter else 'true',
+        'EXTRACT_BACKEND': 'api',
+        'PIPELINE_CHUNK_SIZE': str(args.chunk_size),
+        'SEND_ID': '10001',
+        'REMIND_DAYS': '366',
+        # Stage timings come from the metrics log of the run
+        'METRICS_JSONL': os.path.join(workdir, 'metrics.jsonl'),
+        'METRICS_PORT': '0',
+    }
+    with open(os.path.join(workdir, 'config.env'), 'w', encoding='utf-8') as f:
+        f.writelines(f'{key}={value}\n' for key, value in settings.items())
+    # Also in the environment, for modules that read it directly
+    os.environ.update(settings)
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompt.txt'), workdir)
+    os.makedirs(os.path.join(workdir, 'output'), exist_ok=True)
+    datebase.DB_PATH = os.path.join(workdir, 'qq.db')
+    extract_cache.CACHE_DB = os.path.join(workdir, 'cache.db')
+    llm_api.API_URL = f'http://127.0.0.1:{llm_port}/v1/chat/completions'
+
+
+def load_stage_log(path):
+    """Read the per-stage records metrics.py wrote during the run"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            event = json.loads(line)
+            if event.get('event') == 'stage':
+                # Stages without an item count (API round trips, sends) count calls
+                items = event.get('items')
+                record(event['stage'], event['seconds'], 1 if items is None else items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the QQ bot pipeline against mock services")
+    parser.add_argument('--messages', type=int, default=10000, help="Total messages across all groups")
+    parser.add_argument('--groups', type=int, default=2)
+    parser.add_argument('--page-size', type=int, default=200, help="Messages per get_group_msg_history page")
+    parser.add_argument('--napcat-latency', type=float, default=0.0, help="Seconds per NapCat request")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="Seconds per LLM request")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--api-concurrency', type=int, default=4)
+    parser.add_argument('--fetch-concurrency', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=256, help="Messages per extract/commit chunk")
+    parser.add_argument('--no-prefilter', action='store_true', help="Send every message to the LLM")
+    parser.add_argument('--output', default=None, help="JSON file, default bench_results/benchmark_<time>.json")
+    args = parser.parse_args()
+
+    group_ids = [str(100000 + i) for i in range(args.groups)]
+    napcat = mock_napcat.MockNapCat(group_ids, args.messages // args.groups, latency=args.napcat_latency)
+    napcat_server = mock_napcat.serve(napcat, port=0)
+    llm_mock = mock_llm.MockLLM(args.llm_latency)
+    llm_server = mock_llm.serve(llm_mock, port=0)
+
+    repo_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='qqbot_bench_')
+    os.chdir(workdir)
+    try:
+        # send.py opens send.log at import, import it only inside the scratch directory
+        import send
+        import work
+        configure(workdir, args, napcat_server.server_address[1], llm_server.server_address[1], group_ids)
+        datebase.init_database()
+        # Start every group from the beginning of its history
+        for group_id in group_ids:
+            datebase.set_cursor(group_id, 0, None)
+
+        print(f"Running pipeline on {args.messages} messages in {args.groups} groups...")
+        log = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            work.work()
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            send.check_all()
+        send_seconds = time.perf_counter() - start
+        load_stage_log(os.path.join(workdir, 'metrics.jsonl'))
+        record('send_total', send_seconds, 1)
+    finally:
+        os.chdir(repo_dir)
+        napcat_server.shutdown()
+        llm_server.shutdown()
+
+    result = {
+        'timestamp': int(time.time()),
+        'commit': git_commit(),
+        'params': vars(args),
+        'napcat_requests': napcat.requests,
+        'llm_requests': llm_mock.requests,
+        'cache': dict(extract_cache.stats),
+        'stored_records': len(datebase.iter_data()),
+        'stages': summarize(),
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'stage':<14}{'calls':>8}{'items':>10}{'total s':>10}{'items/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, stats in result['stages'].items():
+        print(f"{stage:<14}{stats['calls']:>8}{stats['items']:>10}{stats['total_seconds']:>10}"
+              f"{str(stats['items_per_second']):>12}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"NapCat requests: {napcat.requests}, LLM requests: {llm_mock.requests}, "
+          f"stored records: {result['stored_records']}")
+
+    output = args.output or os.path.join('bench_results', f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,595 @@
 import sqlite3
+import glob
 import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = 'qq.db'
+# Analysis output of every extraction run, named after the run's start time
+OUTPUT_PATTERN = 'output/qq_messages_analysis_*.txt'
+
+# Connection of the session active in the current thread
+_local = threading.local()
+
+# Called with [(qq_id, deadline, message), ...] after newly stored deadlines are committed
+insert_hooks = []
+
+def connect():
+    """Open a database connection in WAL mode"""
+    # sqlite3 keeps prepared statements in a per-connection cache
+    conn = sqlite3.connect(DB_PATH, cached_statements=128)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    return conn
+
+@contextmanager
+def session():
+    """
+    Run several database operations on one connection and in one transaction
+    
+    Functions of this module called inside the block reuse its connection,
+    the transaction is committed once when the outermost block exits.
+    Outside a session every function runs in its own short session.
+    
+    Yields:
+        sqlite3.Connection
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        # Nested session, the outer one commits
+        yield conn
+        return
+    
+    conn = connect()
+    _local.conn = conn
+    _local.after_commit = []
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _local.conn = None
+        callbacks, _local.after_commit = _local.after_commit, []
+        conn.close()
+    for callback in callbacks:
+        callback()
+
+def on_commit(callback):
+    """Run callback once the current session commits (dropped on rollback)"""
+    if getattr(_local, 'conn', None) is None:
+        callback()
+    else:
+        _local.after_commit.append(callback)
 
 def create_table():
     """Create database table, skip if table already exists"""
-    conn = sqlite3.connect('qq.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS qq (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            group_id TEXT,
-            message_id TEXT,
-            message TEXT,
-            time TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with session() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS qq (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id TEXT,
+                message_id TEXT,
+                message TEXT,
+                time TEXT
+            )
+        ''')
+
+def infer_year(month, day, reference):
+    """Pick the year that puts month/day closest to the reference date"""
+    best = None
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidate = datetime(year, month, day)
+        except ValueError:
+            continue
+        if best is None or abs(candidate - reference) < abs(best - reference):
+            best = candidate
+    return best.year if best else reference.year
+
+def parse_deadlines(time_str, reference=None):
+    """
+    Parse an extracted time string into deadline timestamps
+    
+    Args:
+        time_str: Time information, "MM:DD:HH:MM" parts joined by "-" or newlines
+        reference: datetime the message was seen at, used to infer the year
+        
+    Returns:
+        List of epoch seconds (local time), invalid parts are skipped
+    """
+    reference = reference or datetime.now()
+    deadlines = []
+    # Leading digits only: answers like "09:24:18:00 截止" or one time per line
+    for part in re.split(r'[-\n]', time_str or ''):
+        match = re.match(r'\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?', part)
+        if not match:
+            continue
+        month, day = int(match.group(1)), int(match.group(2))
+        hour, minute = int(match.group(3) or 0), int(match.group(4) or 0)
+        if hour > 23 or minute > 59:
+            # The date alone is still a deadline, as check_all used to read it
+            hour, minute = 0, 0
+        try:
+            year = infer_year(month, day, reference)
+            deadlines.append(int(datetime(year, month, day, hour, minute).timestamp()))
+        except ValueError:
+            continue
+    return deadlines
+
+def output_times(messages, pattern=None):
+    """
+    When messages were first written to the analysis output files
+    
+    Rows stored before schema version 1 have no created_at; the output file of
+    the run that extracted them tells when they were seen.
+    
+    Args:
+        messages: Message texts
+        pattern: Glob of the output files, default OUTPUT_PATTERN
+        
+    Returns:
+        Dictionary message -> datetime of the earliest run that wrote it
+    """
+    seen = {}
+    # File names sort chronologically
+    for path in sorted(glob.glob(pattern or OUTPUT_PATTERN)):
+        match = re.search(r'(\d{8}_\d{6})\.txt$', path)
+        if not match:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        run_time = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+        for message in messages:
+            if message not in seen and message and message.strip() and message.strip() in text:
+                seen[message] = run_time
+    return seen
+
+def migrate(conn):
+    """
+    Upgrade an existing database to the current schema in place
+    
+    Version 1: UNIQUE index on (group_id, message_id) (duplicates keep the
+    oldest row), created_at column, and a deadline table with one row per
+    parsed deadline indexed by timestamp. The year of an existing deadline is
+    inferred from when its message was seen (created_at, else the first
+    analysis output file containing it), not from the migration date.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < 1:
+        print("Migrating database to schema version 1...")
+        conn.execute('''
+            DELETE FROM qq WHERE id NOT IN (
+                SELECT MIN(id) FROM qq GROUP BY group_id, message_id
+            )
+        ''')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_qq_group_message ON qq (group_id, message_id)')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(qq)')]
+        if 'created_at' not in columns:
+            conn.execute('ALTER TABLE qq ADD COLUMN created_at INTEGER')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS deadline (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                qq_id INTEGER NOT NULL REFERENCES qq (id) ON DELETE CASCADE,
+                deadline INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_deadline_deadline ON deadline (deadline)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_deadline_qq_id ON deadline (qq_id)')
+        rows = conn.execute('SELECT id, message, time, created_at FROM qq').fetchall()
+        seen = output_times([message for qq_id, message, time_str, created_at in rows if created_at is None])
+        deadlines = []
+        for qq_id, message, time_str, created_at in rows:
+            if created_at is not None:
+                reference = datetime.fromtimestamp(created_at)
+            else:
+                reference = seen.get(message)
+                if reference is not None:
+                    conn.execute('UPDATE qq SET created_at = ? WHERE id = ?', (int(reference.timestamp()), qq_id))
+            # Without either the migration date is the best guess
+            deadlines.extend((qq_id, deadline) for deadline in parse_deadlines(time_str, reference))
+        conn.executemany('INSERT INTO deadline (qq_id, deadline) VALUES (?, ?)', deadlines)
+        conn.execute('PRAGMA user_version = 1')
+        print("Database migrated to schema version 1")
+    if version < 2:
+        # Version 2: archive table for records whose deadlines have all expired
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS qq_archive (
+                id INTEGER PRIMARY KEY,
+                group_id TEXT,
+                message_id TEXT,
+                message TEXT,
+                time TEXT,
+                created_at INTEGER,
+                archived_at INTEGER
+            )
+        ''')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_qq_archive_group_message ON qq_archive (group_id, message_id)')
+        conn.execute('PRAGMA user_version = 2')
+        print("Database migrated to schema version 2")
+    if version < 3:
+        # Version 3: per-group high-water mark of processed messages
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS group_cursor (
+                group_id TEXT PRIMARY KEY,
+                message_seq INTEGER,
+                message_id TEXT,
+                updated_at INTEGER
+            )
+        ''')
+        conn.execute('PRAGMA user_version = 3')
+        print("Database migrated to schema version 3")
+    if version < 4:
+        # Version 4: resumable history backfill, oldest committed seq per group
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS backfill_checkpoint (
+                group_id TEXT PRIMARY KEY,
+                next_seq INTEGER,
+                processed INTEGER NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0,
+                updated_at INTEGER
+            )
+        ''')
+        conn.execute('PRAGMA user_version = 4')
+        print("Database migrated to schema version 4")
+    if version < 5:
+        # Version 5: delivery ledger (one row per reminder and recipient) and a durable send queue
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sent_reminder (
+                qq_id INTEGER NOT NULL,
+                deadline INTEGER NOT NULL,
+                lead INTEGER NOT NULL,
+                recipient TEXT NOT NULL,
+                queue_id INTEGER,
+                sent_at INTEGER,
+                PRIMARY KEY (qq_id, deadline, lead, recipient)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS send_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                nodes TEXT NOT NULL,
+                expires_at INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt INTEGER NOT NULL,
+                last_error TEXT,
+                created_at INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_send_queue_next_attempt ON send_queue (next_attempt)')
+        conn.execute('PRAGMA user_version = 5')
+        print("Database migrated to schema version 5")
+    if version < 6:
+        # Version 6: messages a catch-up could not reach yet, low_seq < message_seq < high_seq
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS catchup_gap (
+                group_id TEXT PRIMARY KEY,
+                low_seq INTEGER NOT NULL,
+                high_seq INTEGER NOT NULL,
+                updated_at INTEGER
+            )
+        ''')
+        conn.execute('PRAGMA user_version = 6')
+        print("Database migrated to schema version 6")
 
 def init_database():
-    """Initialize database, create if database file doesn't exist"""
-    if not os.path.exists('qq.db'):
+    """Initialize database, create if database file doesn't exist, then upgrade its schema"""
+    if not os.path.exists(DB_PATH):
         print("Database file not found, creating new database...")
         create_table()
         print("Database initialized successfully!")
     else:
         print("Database file exists, skipping initialization.")
+    with session() as conn:
+        migrate(conn)
 
 def insert_data(group_id, message_id, message, time):
-    conn = sqlite3.connect('qq.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO qq (group_id, message_id, message, time) VALUES (?, ?, ?, ?)
-    ''', (group_id, message_id, message, time))
-    conn.commit()
-    conn.close()
+    insert_many([(group_id, message_id, message, time)])
+
+def insert_many(rows):
+    """
+    Insert many records with one statement, records already stored or archived are skipped
+    
+    Args:
+        rows: List of (group_id, message_id, message, time) tuples
+    """
+    now = datetime.now()
+    with session() as conn:
+        conn.executemany('''
+            INSERT OR IGNORE INTO qq (group_id, message_id, message, time, created_at)
+            SELECT ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM qq_archive WHERE group_id = ? AND message_id = ?)
+        ''', [
+            (group_id, message_id, message, time, int(now.timestamp()), group_id, message_id)
+            for group_id, message_id, message, time in rows
+        ])
+        conn.executemany('''
+            INSERT INTO deadline (qq_id, deadline)
+            SELECT id, ? FROM qq
+            WHERE group_id = ? AND message_id = ? AND created_at = ?
+            AND NOT EXISTS (SELECT 1 FROM deadline d WHERE d.qq_id = qq.id AND d.deadline = ?)
+        ''', [
+            (deadline, group_id, message_id, int(now.timestamp()), deadline)
+            for group_id, message_id, message, time in rows
+            for deadline in parse_deadlines(time, now)
+        ])
+        if insert_hooks and rows:
+            # Deadlines of the records this call stored, for the reminder scheduler
+            added = []
+            for group_id, message_id, message, time in rows:
+                added.extend(conn.execute('''
+                    SELECT qq.id, deadline.deadline, qq.message FROM deadline JOIN qq ON qq.id = deadline.qq_id
+                    WHERE qq.group_id = ? AND qq.message_id = ? AND qq.created_at = ?
+                ''', (group_id, message_id, int(now.timestamp()))).fetchall())
+            if added:
+                for hook in insert_hooks:
+                    on_commit(lambda hook=hook: hook(added))
 
 def remove_data(group_id, message_id):
-    conn = sqlite3.connect('qq.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        DELETE FROM qq WHERE group_id = ? AND message_id = ?
-    ''', (group_id, message_id))
-    conn.commit()
-    conn.close()
+    with session() as conn:
+        conn.execute('''
+            DELETE FROM qq WHERE group_id = ? AND message_id = ?
+        ''', (group_id, message_id))
 
 def find_if_exist(group_id, message_id):
-    conn = sqlite3.connect('qq.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM qq WHERE group_id = ? AND message_id = ?
-    ''', (group_id, message_id))
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT id, group_id, message_id, message, time FROM qq WHERE group_id = ? AND message_id = ?
+        ''', (group_id, message_id))
+        result = cursor.fetchone()
+        if result is None:
+            cursor = conn.execute('''
+                SELECT id, group_id, message_id, message, time FROM qq_archive WHERE group_id = ? AND message_id = ?
+            ''', (group_id, message_id))
+            result = cursor.fetchone()
+        return result
+
+def iter_due(start, end):
+    """
+    Get records with at least one deadline in [start, end)
+    
+    Args:
+        start: Window start, epoch seconds
+        end: Window end, epoch seconds
+        
+    Returns:
+        List of (id, group_id, message_id, message, time, first deadline in the window),
+        earliest deadline first
+    """
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT qq.id, qq.group_id, qq.message_id, qq.message, qq.time, MIN(deadline.deadline)
+            FROM deadline JOIN qq ON qq.id = deadline.qq_id
+            WHERE deadline.deadline >= ? AND deadline.deadline < ?
+            GROUP BY qq.id
+            ORDER BY MIN(deadline.deadline)
+        ''', (start, end))
+        return cursor.fetchall()
+
+def iter_deadlines(start):
+    """
+    Get all deadlines at or after start
+    
+    Args:
+        start: Epoch seconds
+        
+    Returns:
+        List of (qq_id, deadline, message), earliest deadline first
+    """
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT qq.id, deadline.deadline, qq.message
+            FROM deadline JOIN qq ON qq.id = deadline.qq_id
+            WHERE deadline.deadline >= ?
+            ORDER BY deadline.deadline
+        ''', (start,))
+        return cursor.fetchall()
+
+def archive_expired(retention_days=30):
+    """
+    Move records whose deadlines all ended more than retention_days ago to qq_archive
+    
+    Records without any parsed deadline are archived once they are older
+    than retention_days.
+    
+    Args:
+        retention_days: Days to keep expired records in the qq table
+        
+    Returns:
+        Number of archived records
+    """
+    now = int(datetime.now().timestamp())
+    cutoff = now - retention_days * 86400
+    with session() as conn:
+        expired = [row[0] for row in conn.execute('''
+            SELECT qq.id FROM qq LEFT JOIN deadline ON deadline.qq_id = qq.id
+            GROUP BY qq.id
+            HAVING (MAX(deadline.deadline) IS NULL AND COALESCE(qq.created_at, 0) < ?)
+                OR MAX(deadline.deadline) < ?
+        ''', (cutoff, cutoff))]
+        conn.executemany('''
+            INSERT OR IGNORE INTO qq_archive (id, group_id, message_id, message, time, created_at, archived_at)
+            SELECT id, group_id, message_id, message, time, created_at, ? FROM qq WHERE id = ?
+        ''', [(now, qq_id) for qq_id in expired])
+        conn.executemany('DELETE FROM qq WHERE id = ?', [(qq_id,) for qq_id in expired])
+        conn.execute('DELETE FROM sent_reminder WHERE deadline < ? AND sent_at IS NOT NULL', (cutoff,))
+    return len(expired)
 
 def iter_data():
-    conn = sqlite3.connect('qq.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM qq
-    ''')
-    result = cursor.fetchall()
-    conn.close()
-    return result
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT id, group_id, message_id, message, time FROM qq
+        ''')
+        return cursor.fetchall()
+def get_cursor(group_id):
+    """
+    Get the last processed message of a group
+    
+    Returns:
+        (message_seq, message_id), or None if the group was never processed
+    """
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT message_seq, message_id FROM group_cursor WHERE group_id = ?
+        ''', (str(group_id),))
+        return cursor.fetchone()
+
+def set_cursor(group_id, message_seq, message_id):
+    """Store the last processed message of a group"""
+    with session() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO group_cursor (group_id, message_seq, message_id, updated_at) VALUES (?, ?, ?, ?)
+        ''', (str(group_id), message_seq, message_id, int(datetime.now().timestamp())))
+
+def get_gap(group_id):
+    """
+    Get the range of a group's messages below its cursor that are still to be fetched
+    
+    Returns:
+        (low_seq, high_seq), exclusive, or None if the group has no gap
+    """
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT low_seq, high_seq FROM catchup_gap WHERE group_id = ?
+        ''', (str(group_id),))
+        return cursor.fetchone()
+
+def set_gap(group_id, gap):
+    """Store the range still to be fetched, None once the catch-up is complete"""
+    with session() as conn:
+        if gap is None:
+            conn.execute('DELETE FROM catchup_gap WHERE group_id = ?', (str(group_id),))
+        else:
+            conn.execute('''
+                INSERT OR REPLACE INTO catchup_gap (group_id, low_seq, high_seq, updated_at) VALUES (?, ?, ?, ?)
+            ''', (str(group_id), gap[0], gap[1], int(datetime.now().timestamp())))
+
+def get_backfill(group_id):
+    """
+    Get the backfill checkpoint of a group
+    
+    Returns:
+        (next_seq, processed, done), or None if the group was never backfilled
+    """
+    with session() as conn:
+        cursor = conn.execute('''
+            SELECT next_seq, processed, done FROM backfill_checkpoint WHERE group_id = ?
+        ''', (str(group_id),))
+        return cursor.fetchone()
+
+def set_backfill(group_id, next_seq, processed, done=False):
+    """Store the backfill checkpoint of a group: messages older than next_seq are still to be fetched"""
+    with session() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO backfill_checkpoint (group_id, next_seq, processed, done, updated_at) VALUES (?, ?, ?, ?, ?)
+        ''', (str(group_id), next_seq, processed, int(done), int(datetime.now().timestamp())))
+
+def claim_reminders(keys, recipient):
+    """
+    Record reminders in the delivery ledger, skipping those already queued or sent
+    
+    Args:
+        keys: List of (qq_id, deadline, lead) tuples
+        recipient: QQ number the reminders go to
+        
+    Returns:
+        List of the keys that were not in the ledger yet
+    """
+    claimed = []
+    with session() as conn:
+        for qq_id, deadline, lead in keys:
+            cursor = conn.execute('''
+                INSERT OR IGNORE INTO sent_reminder (qq_id, deadline, lead, recipient) VALUES (?, ?, ?, ?)
+            ''', (qq_id, deadline, lead, str(recipient)))
+            if cursor.rowcount:
+                claimed.append((qq_id, deadline, lead))
+    return claimed
+
+def enqueue_send(recipient, nodes, expires_at, keys):
+    """
+    Add a forward message to the send queue and attach its ledger rows
+    
+    Args:
+        recipient: QQ number
+        nodes: JSON text of the node texts
+        expires_at: Epoch seconds after which the message is useless
+        keys: (qq_id, deadline, lead) tuples the message delivers
+        
+    Returns:
+        Queue row id
+    """
+    now = int(datetime.now().timestamp())
+    with session() as conn:
+        cursor = conn.execute('''
+            INSERT INTO send_queue (recipient, nodes, expires_at, next_attempt, created_at) VALUES (?, ?, ?, ?, ?)
+        ''', (str(recipient), nodes, expires_at, now, now))
+        queue_id = cursor.lastrowid
+        conn.executemany('''
+            UPDATE sent_reminder SET queue_id = ? WHERE qq_id = ? AND deadline = ? AND lead = ? AND recipient = ?
+        ''', [(queue_id, qq_id, deadline, lead, str(recipient)) for qq_id, deadline, lead in keys])
+    return queue_id
+
+def get_send(queue_id):
+    """Get a queued message: (id, recipient, nodes, expires_at, attempts), or None"""
+    with session() as conn:
+        return conn.execute('''
+            SELECT id, recipient, nodes, expires_at, attempts FROM send_queue WHERE id = ?
+        ''', (queue_id,)).fetchone()
+
+def lease_send(queue_id, now, lease):
+    """
+    Claim a due queued message for one attempt
+    
+    Moves next_attempt lease seconds ahead in one statement, so of several
+    threads or processes picking the same due row only one gets it. If the
+    holder dies, the row is due again after the lease.
+    
+    Returns:
+        True if this caller holds the lease
+    """
+    with session() as conn:
+        cursor = conn.execute('''
+            UPDATE send_queue SET next_attempt = ? WHERE id = ? AND next_attempt <= ?
+        ''', (now + lease, queue_id, now))
+        return cursor.rowcount == 1
+
+def due_sends(now):
+    """Ids of queued messages whose next attempt is due, oldest first"""
+    with session() as conn:
+        return [row[0] for row in conn.execute('''
+            SELECT id FROM send_queue WHERE next_attempt <= ? ORDER BY id
+        ''', (now,))]
+
+def mark_sent(queue_id):
+    """Mark the reminders of a queued message delivered and remove it from the queue"""
+    with session() as conn:
+        conn.execute('UPDATE sent_reminder SET sent_at = ? WHERE queue_id = ?', (int(datetime.now().timestamp()), queue_id))
+        conn.execute('DELETE FROM send_queue WHERE id = ?', (queue_id,))
+
+def mark_failed(queue_id, next_attempt, error):
+    """Record a failed attempt and when to try again"""
+    with session() as conn:
+        conn.execute('''
+            UPDATE send_queue SET attempts = attempts + 1, next_attempt = ?, last_error = ? WHERE id = ?
+        ''', (next_attempt, error, queue_id))
+
+def drop_send(queue_id):
+    """Remove an expired message from the queue, its ledger rows stay unsent"""
+    with session() as conn:
+        conn.execute('DELETE FROM send_queue WHERE id = ?', (queue_id,))
+
 def remove_all_data():
-    conn = sqlite3.connect('qq.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        DELETE FROM qq
-    ''')
-    conn.commit()
-    conn.close()
+    with session() as conn:
+        conn.execute('''
+            DELETE FROM qq
+        ''')
 if __name__ == "__main__":
     remove_all_data()
     # remove_data('1062848088', '889743639')
     for i in iter_data():
-        print(i)
\ No newline at end of file
+        print(i)
@@ -0,0 +1,165 @@
+import sqlite3
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+
+CACHE_DB = 'cache.db'
+# Most recent pre-filter samples kept for measuring the fast path
+SAMPLE_LIMIT = 2000
+
+# Hit/miss counters of the current process
+stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+def create_cache_table(conn):
+    """Create cache table, skip if table already exists"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS extract_cache (
+            key TEXT PRIMARY KEY,
+            result TEXT,
+            created_at REAL,
+            last_used REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_extract_cache_last_used ON extract_cache (last_used)')
+    # LLM answers of messages the pre-filter fast path would have answered itself
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prefilter_samples (
+            message TEXT PRIMARY KEY,
+            quick TEXT,
+            llm TEXT,
+            created_at REAL
+        )
+    ''')
+
+def connect():
+    conn = sqlite3.connect(CACHE_DB)
+    create_cache_table(conn)
+    return conn
+
+def normalize_message(message_text):
+    """Normalize message text so reposts with different spacing share a key"""
+    text = unicodedata.normalize('NFKC', message_text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def cache_key(prompt, model_name, message_text):
+    """
+    Build the content-addressed key of one extraction
+    
+    Args:
+        prompt: Contents of prompt.txt
+        model_name: Name of the model that does the extraction
+        message_text: QQ group message text
+        
+    Returns:
+        Hex sha256 digest
+    """
+    digest = hashlib.sha256()
+    for part in (prompt, model_name or '', normalize_message(message_text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def lookup_many(keys):
+    """
+    Look up cached results
+    
+    Args:
+        keys: List of cache keys
+        
+    Returns:
+        Dictionary key -> cached result (None means "no time information")
+    """
+    found = {}
+    if not keys:
+        return found
+    conn = connect()
+    cursor = conn.cursor()
+    unique_keys = list(set(keys))
+    # SQLite limits the number of bound parameters per statement
+    for start in range(0, len(unique_keys), 500):
+        chunk = unique_keys[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'SELECT key, result FROM extract_cache WHERE key IN ({placeholders})', chunk)
+        found.update(cursor.fetchall())
+    if found:
+        cursor.executemany('UPDATE extract_cache SET last_used = ? WHERE key = ?', [(time.time(), key) for key in found])
+        conn.commit()
+    conn.close()
+    
+    for key in keys:
+        if key in found:
+            stats['hits'] += 1
+        else:
+            stats['misses'] += 1
+    return found
+
+def store_many(items, max_entries=50000):
+    """
+    Store extraction results and evict least recently used entries over max_entries
+    
+    Args:
+        items: List of (key, result) pairs
+        max_entries: Maximum number of cached results
+    """
+    if not items:
+        return
+    now = time.time()
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT OR REPLACE INTO extract_cache (key, result, created_at, last_used) VALUES (?, ?, ?, ?)
+    ''', [(key, result, now, now) for key, result in items])
+    stats['stores'] += len(items)
+    
+    cursor.execute('SELECT COUNT(*) FROM extract_cache')
+    overflow = cursor.fetchone()[0] - max_entries
+    if overflow > 0:
+        cursor.execute('''
+            DELETE FROM extract_cache WHERE key IN (
+                SELECT key FROM extract_cache ORDER BY last_used LIMIT ?
+            )
+        ''', (overflow,))
+        stats['evictions'] += overflow
+    conn.commit()
+    conn.close()
+
+def store_samples(items):
+    """
+    Keep the LLM answers of messages the pre-filter fast path would have answered,
+    the newest SAMPLE_LIMIT of them
+    
+    Args:
+        items: List of (message, fast path answer, LLM answer or None)
+    """
+    if not items:
+        return
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT OR REPLACE INTO prefilter_samples (message, quick, llm, created_at) VALUES (?, ?, ?, ?)
+    ''', [(message, quick, llm, time.time()) for message, quick, llm in items])
+    cursor.execute('''
+        DELETE FROM prefilter_samples WHERE message NOT IN (
+            SELECT message FROM prefilter_samples ORDER BY created_at DESC LIMIT ?
+        )
+    ''', (SAMPLE_LIMIT,))
+    conn.commit()
+    conn.close()
+
+def load_samples():
+    """
+    Returns:
+        List of (message, fast path answer, LLM answer or None)
+    """
+    conn = connect()
+    samples = conn.execute('SELECT message, quick, llm FROM prefilter_samples').fetchall()
+    conn.close()
+    return samples
+
+def log_stats():
+    total = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] / total * 100 if total else 0.0
+    logging.info(f"Extraction cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hit rate), "
+                 f"{stats['stores']} stored, {stats['evictions']} evicted")
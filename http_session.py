@@ -0,0 +1,52 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def create_session(pool_size=10):
+    """
+    Create a requests session with a keep-alive connection pool
+    
+    Args:
+        pool_size: Maximum number of pooled connections per host
+        
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def post_with_retry(session, url, retries=3, backoff=1.0, **kwargs):
+    """
+    POST with retries and exponential backoff
+    
+    Connection errors, timeouts, HTTP 429 and 5xx responses are retried,
+    waiting backoff, 2*backoff, 4*backoff... seconds between attempts.
+    
+    Args:
+        session: requests.Session to send the request with
+        url: Request URL
+        retries: Number of retries after the first attempt
+        backoff: Initial wait time in seconds
+        **kwargs: Passed to session.post (json, headers, timeout...)
+        
+    Returns:
+        requests.Response of the last attempt
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = session.post(url, **kwargs)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == retries:
+                return response
+            print(f"请求返回 {response.status_code}，{backoff * 2 ** attempt:.1f}秒后重试 ({attempt + 1}/{retries})")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == retries:
+                raise
+            print(f"请求失败: {e}，{backoff * 2 ** attempt:.1f}秒后重试 ({attempt + 1}/{retries})")
+        time.sleep(backoff * 2 ** attempt)
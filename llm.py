@@ -1,195 +1,140 @@
-import os
-# 设置环境变量，强制离线模式
-os.environ["TRANSFORMERS_OFFLINE"] = "1"
-os.environ["HF_HUB_OFFLINE"] = "1"
-
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
-import torch
-import requests
-import json
-
-# Global variables to store model and tokenizer
-model = None
-tokenizer = None
+"""
+Time extraction backends
 
-def load_model():
-    """Load model and tokenizer to GPU, execute only once"""
-    global model, tokenizer
-    
-    if model is not None and tokenizer is not None:
-        print("Model already loaded, skipping reload")
-        return
-    
-    print("Loading model to GPU...")
-    model_name = "Qwen/Qwen3-8B"
+Only the parts every backend shares live here (prompt.txt, answer cleanup)
+together with the backend registry. A backend module is imported the first
+time EXTRACT_BACKEND selects it, so the API deployment never imports torch or
+transformers. Each backend module provides:
 
-    # Configure 4-bit quantization
-    quantization_config = BitsAndBytesConfig(
-        load_in_4bit=True,  # Enable 4-bit quantization
-        bnb_4bit_quant_type="nf4",  # Use NF4 data type, more friendly to normal distribution weights
-        bnb_4bit_compute_dtype=torch.float16,  # Use float16 for computation
-        bnb_4bit_use_double_quant=True,  # Enable nested quantization, saves additional ~0.5GB VRAM
-    )
+    model_id(config)                             name of the model, part of the extraction cache key
+    extract_batch(message_texts, config, on_error=None)
+                                                 time information per message, on_error for failures
+    unload()                                     release the model
+"""
+import importlib
+import os
+import re
+import sys
+import threading
+# prompt.txt contents, re-read only when the file changes
+prompt_cache = {"mtime": None, "text": None}
 
-    # Load tokenizer and quantized model from local cache only
-    tokenizer = AutoTokenizer.from_pretrained(
-        model_name,
-        local_files_only=True  # 只从本地加载，不连接网络
-    )
-    model = AutoModelForCausalLM.from_pretrained(
-        model_name,
-        torch_dtype="auto",
-        device_map="auto",
-        quantization_config=quantization_config,  # Key: pass quantization config
-        local_files_only=True  # 只从本地加载，不连接网络
-    )
-    print("Model loading completed")
+NO_TIME_ANSWERS = ['无', '没有', 'none', 'no', '无时间信息', '未检测到时间信息', 'no time information detected']
+TIME_PATTERN = r'\d{2}:\d{2}:\d{2}:\d{2}'
 
-def extract_time_info(message_text):
+def clean_content(content, check_format=False):
     """
-    Extract time information from message text
+    Strip thinking text from a model answer and normalize "no time" answers
     
     Args:
-        message_text: QQ group message text to analyze
+        content: Raw answer text returned by the model
+        check_format: Also require at least one MM:DD:HH:MM time in the answer
         
     Returns:
-        Extracted time information string
+        Cleaned time information string, or None if no time information
     """
-    global model, tokenizer
-    
-    # Ensure model is loaded
-    if model is None or tokenizer is None:
-        load_model()
-    
-    prompt = open("prompt.txt", "r").read() 
-    print(f"prompt: {prompt}")
-    
-    # Build complete prompt
-    full_prompt = prompt + "\n" + message_text
-    
-    messages = [
-        {"role": "user", "content": full_prompt}
-    ]
-    
-    text = tokenizer.apply_chat_template(
-        messages,
-        tokenize=False,
-        add_generation_prompt=True,
-        enable_thinking=True  # Switches between thinking and non-thinking modes. Default is True.
-    )
-    
-    model_inputs = tokenizer([text], return_tensors="pt").to(model.device)
-
-    # Perform text generation
-    generated_ids = model.generate(
-        **model_inputs,
-        max_new_tokens=2048,
-        temperature=0.1,  # Lower temperature for more stable output
-        top_p=0.9,        # Nucleus sampling parameter
-        do_sample=True,   # Enable sampling
-        repetition_penalty=1.1  # Repetition penalty
-    )
-    output_ids = generated_ids[0][len(model_inputs.input_ids[0]):].tolist() 
-
-    content = tokenizer.decode(output_ids, skip_special_tokens=True).strip("\n")
-    if "<think>" in content:
-        content = content.split("<think>")[1].split("</think>")[1]
-    # Debug information
-    # print(f"Thinking content: {thinking_content[:100]}...")
-    print(f"Final content: {content}")
-    
-    # Check if contains time information
-    if not content or content.lower() in ['无', '没有', 'none', 'no', '无时间信息', '未检测到时间信息', 'no time information detected']:
+    if content is None:
         return None
-    
-    # Check if contains time format (MM:DD:time)
-    import re
-    time_pattern = r'\d{2}:\d{2}:\d{2}:\d{2}'
-    if not re.search(time_pattern, content):
+    if "</think>" in content:
+        content = content.split("</think>")[-1]
+    elif "<think>" in content:
+        # Thinking was cut off before any answer was produced
+        return None
+    content = content.strip()
+    if not content or content.lower() in NO_TIME_ANSWERS:
+        return None
+    if check_format and not re.search(TIME_PATTERN, content):
         return None
-    
     return content
 
-def extract_time_info_by_api(message_text):
+def load_prompt(path="prompt.txt"):
+    """Read prompt.txt, cached until the file's mtime changes"""
+    mtime = os.path.getmtime(path)
+    if prompt_cache["mtime"] != mtime:
+        with open(path, "r") as f:
+            prompt_cache["text"] = f.read()
+        prompt_cache["mtime"] = mtime
+    return prompt_cache["text"]
+
+# 批量模式下附加在prompt后的说明，每条消息有一个编号的答案位置
+BATCH_INSTRUCTION = """以下共有{count}条消息，每条消息以【编号】开头。
+请按上述要求分别处理每条消息，每条消息的结果单独占一行，格式为：【编号】结果
+没有时间信息的消息输出：【编号】none
+"""
+SLOT_PATTERN = re.compile(r'^\s*【(\d+)】\s*(.*)$')
+
+def build_batch_prompt(prompt, message_texts):
+    """prompt.txt followed by the numbered messages of one packed request"""
+    full_prompt = prompt + "\n" + BATCH_INSTRUCTION.format(count=len(message_texts))
+    for i, message_text in enumerate(message_texts, 1):
+        full_prompt += f"\n【{i}】{message_text}\n"
+    return full_prompt
+
+def parse_batch_answer(content, count):
     """
-    Extract time information from message text using API
+    Split a packed answer back into per-message answers
     
     Args:
-        message_text: QQ group message text to analyze
+        content: Raw answer text for a packed request
+        count: Number of messages in the request
         
     Returns:
-        Extracted time information string
+        List of raw answers indexed by message position; missing slots are None
     """
-    try:
-        # 读取prompt文件
-        prompt = open("prompt.txt", "r").read() 
-        print(f"prompt: {prompt}")
-        
-        # 构建完整的prompt
-        full_prompt = prompt + "\n" + message_text
-        
-        # API请求数据
-        api_data = {
-            "model": "deepseek_reasoner_web",
-            "messages": [
-                {"role": "user", "content": full_prompt}
-            ],
-            "stream": False
-        }
-        
-        # 调用API
-        response = requests.post(
-            "http://localhost:8000/v1/chat/completions",
-            json=api_data,
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            print(f"API调用失败，状态码: {response.status_code}")
-            return None
-            
-        result = response.json()
-        content = result['choices'][0]['message']['content'].strip()
-        
-        print(f"Final content: {content}")
-        
-        if "<think>" in content:
-            content = content.split("<think>")[1].split("</think>")[1]
-        # 检查是否包含时间信息
-        content = content.strip()
-        print(f"Final content: {content}")
-        if not content or content.lower() in ['无', '没有', 'none', 'no', '无时间信息', '未检测到时间信息', 'no time information detected']:
-            return None
-        
-        # # 检查是否包含时间格式 (MM:DD:time)
-        # import re
-        # time_pattern = r'\d{2}:\d{2}:\d{2}:\d{2}'
-        # if not re.search(time_pattern, content):
-        #     return None
-        return content.strip()
-        
-    except Exception as e:
-        print(f"API调用出错: {str(e)}")
-        return None
+    answers = [None] * count
+    if content is None:
+        return answers
+    if "</think>" in content:
+        content = content.split("</think>")[-1]
+    for line in content.splitlines():
+        match = SLOT_PATTERN.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if 0 <= index < count:
+            # 同一条消息的多个时间用 "-" 连接
+            answer = match.group(2).strip()
+            answers[index] = answer if answers[index] is None else answers[index] + "-" + answer
+    return answers
 
-def unload_model():
-    """Unload model and tokenizer, release GPU memory"""
-    global model, tokenizer
-    
-    if model is not None:
-        del model
-        model = None
-        print("Model unloaded from GPU")
-    
-    if tokenizer is not None:
-        del tokenizer
-        tokenizer = None
-        print("Tokenizer unloaded")
+# EXTRACT_BACKEND -> module implementing it
+BACKENDS = {
+    'api': 'llm_api',
+    'local': 'llm_local',
+    'llama_cpp': 'llm_llama',
+}
+
+# The local models are not thread-safe: the nightly job and the stream worker
+# take turns, and a model is never unloaded in the middle of an extraction
+extract_lock = threading.Lock()
+# Set while the stream worker runs, it keeps using the loaded model
+keep_loaded = False
+
+def register_backend(name, module_name):
+    """Make a backend module selectable as EXTRACT_BACKEND=name"""
+    BACKENDS[name] = module_name
+
+def get_backend(name=None):
+    """
+    Import and return the module of an extraction backend
     
-    # Force garbage collection
-    import gc
-    import torch
-    gc.collect()
-    torch.cuda.empty_cache()  # Clear CUDA cache
-    print("GPU memory cleared")
+    Args:
+        name: Backend name, defaults to EXTRACT_BACKEND
+        
+    Returns:
+        Backend module
+    """
+    name = (name or os.getenv('EXTRACT_BACKEND') or 'api').lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EXTRACT_BACKEND {name!r}, choose one of {', '.join(BACKENDS)}")
+    return importlib.import_module(BACKENDS[name])
 
+def unload_backends():
+    """Unload the models of all backends imported so far, without importing the others"""
+    if keep_loaded:
+        return
+    with extract_lock:
+        for module_name in BACKENDS.values():
+            module = sys.modules.get(module_name)
+            if module is not None:
+                module.unload()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAI-compatible API backend (EXTRACT_BACKEND=api, the default)
+
+Only needs requests, so API-only deployments start without the GPU stack.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http_session import create_session, post_with_retry
+import metrics
+from llm import clean_content, load_prompt, build_batch_prompt, parse_batch_answer
+
+# OpenAI-compatible API used by the *_by_api functions
+API_URL = "http://localhost:8000/v1/chat/completions"
+API_MODEL = "deepseek_reasoner_web"
+
+# Shared keep-alive session for API calls
+api_session = None
+api_session_lock = threading.Lock()
+def get_api_session(pool_size=10):
+    """Get the shared API session, create it on first use"""
+    global api_session
+    
+    with api_session_lock:
+        if api_session is None:
+            api_session = create_session(pool_size)
+        return api_session
+
+def call_api(full_prompt, retries=3):
+    """
+    Send one prompt to the OpenAI-compatible chat completions API
+    
+    Args:
+        full_prompt: Complete user prompt
+        retries: Number of retries on connection errors, timeouts and 5xx
+        
+    Returns:
+        Raw answer text, or None if the request failed
+    """
+    # API请求数据
+    api_data = {
+        "model": API_MODEL,
+        "messages": [
+            {"role": "user", "content": full_prompt}
+        ],
+        "stream": False
+    }
+    
+    # 调用API
+    with metrics.timer('llm_api') as run:
+        response = post_with_retry(
+            get_api_session(),
+            API_URL,
+            retries=retries,
+            json=api_data,
+            timeout=30
+        )
+        run['status'] = response.status_code
+    
+    if response.status_code != 200:
+        print(f"API调用失败，状态码: {response.status_code}")
+        return None
+        
+    result = response.json()
+    return result['choices'][0]['message']['content'].strip()
+
+def extract_time_info_by_api(message_text, retries=3, on_error=None):
+    """
+    Extract time information from message text using API
+    
+    Args:
+        message_text: QQ group message text to analyze
+        retries: Number of retries for the API request
+        on_error: Value returned when the API call fails
+        
+    Returns:
+        Extracted time information string
+    """
+    try:
+        # 读取prompt文件
+        prompt = load_prompt()
+        
+        # 构建完整的prompt
+        full_prompt = prompt + "\n" + message_text
+        
+        content = call_api(full_prompt, retries)
+        print(f"Final content: {content}")
+        if content is None:
+            return on_error
+        
+        # 检查是否包含时间信息
+        return clean_content(content)
+        
+    except Exception as e:
+        print(f"API调用出错: {str(e)}")
+        return on_error
+
+def extract_time_info_by_api_batch(message_texts, batch_size=8, retries=3, on_error=None):
+    """
+    Extract time information from many messages, several messages per API request
+    
+    Messages whose answer slot is missing from the packed reply are retried
+    one by one with extract_time_info_by_api. If the packed request itself
+    fails, its retries are used up already, so the whole batch gets on_error
+    instead of batch_size more failing requests.
+    
+    Args:
+        message_texts: List of QQ group message texts to analyze
+        batch_size: Number of messages packed into one request
+        retries: Number of retries for each API request
+        on_error: Value returned for messages whose API call failed
+        
+    Returns:
+        List of extracted time information strings (or None), same order as input
+    """
+    if not message_texts:
+        return []
+    
+    prompt = load_prompt()
+    results = []
+    
+    for start in range(0, len(message_texts), batch_size):
+        batch = message_texts[start:start + batch_size]
+        if len(batch) == 1:
+            results.append(extract_time_info_by_api(batch[0], retries, on_error))
+            continue
+        
+        full_prompt = build_batch_prompt(prompt, batch)
+        
+        try:
+            content = call_api(full_prompt, retries)
+        except Exception as e:
+            print(f"API调用出错: {str(e)}")
+            content = None
+        print(f"Final content: {content}")
+        if content is None:
+            results.extend([on_error] * len(batch))
+            continue
+        
+        for message_text, answer in zip(batch, parse_batch_answer(content, len(batch))):
+            if answer is None:
+                # 该条消息没有对应的答案，单独重试
+                results.append(extract_time_info_by_api(message_text, retries, on_error))
+            else:
+                results.append(clean_content(answer))
+    
+    return results
+
+def extract_time_info_by_api_concurrent(message_texts, batch_size=8, max_workers=4, retries=3, on_error=None):
+    """
+    Extract time information from many messages with parallel API requests
+    
+    Messages are packed into requests of batch_size messages and at most
+    max_workers requests are in flight at the same time.
+    
+    Args:
+        message_texts: List of QQ group message texts to analyze
+        batch_size: Number of messages packed into one request
+        max_workers: Maximum number of concurrent requests
+        retries: Number of retries for each API request
+        on_error: Value returned for messages whose API call failed
+        
+    Returns:
+        List of extracted time information strings (or None), same order as input
+    """
+    if not message_texts:
+        return []
+    
+    batches = [message_texts[start:start + batch_size] for start in range(0, len(message_texts), batch_size)]
+    print(f"Extracting {len(message_texts)} messages in {len(batches)} requests, {max_workers} in parallel")
+    
+    get_api_session(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(extract_time_info_by_api_batch, batch, batch_size, retries, on_error) for batch in batches]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+    
+    return results
+
+def model_id(config):
+    return API_MODEL
+
+def extract_batch(message_texts, config, on_error=None):
+    """Backend interface: batched, concurrent API requests"""
+    return extract_time_info_by_api_concurrent(
+        message_texts,
+        config.get('batch_size', 8),
+        config.get('api_concurrency', 4),
+        config.get('api_retries', 3),
+        on_error=on_error
+    )
+
+def unload():
+    """Nothing resident, the keep-alive session is reused by the next run"""
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU backend: a quantized GGUF model through llama.cpp (EXTRACT_BACKEND=llama_cpp)
+
+For hosts without a GPU. Needs `pip install llama-cpp-python` and a GGUF file
+at LLAMA_MODEL_PATH, by default a 4-bit Qwen3-1.7B. Messages are packed
+BATCH_SIZE per prompt like the API backend, and the answer is constrained by
+a grammar to exactly one 【n】 line per message, so a small model cannot drift
+into explanations or thinking. llama.cpp keeps the tokens of the previous
+prompt in its KV cache and only evaluates what differs, so prompt.txt at the
+start of every prompt is processed once per model load.
+
+`python bench_extract.py --backends local,llama_cpp --llama-threads 2,4,8`
+compares it with the GPU model and tunes LLAMA_THREADS. That comparison has
+not been run yet: no throughput or accuracy numbers against Qwen3-8B exist
+for this backend, measure them on the target machine before relying on it.
+"""
+import gc
+import os
+import threading
+import metrics
+from llm import clean_content, load_prompt, build_batch_prompt, parse_batch_answer
+
+try:
+    from llama_cpp import Llama, LlamaGrammar
+except ImportError as e:
+    raise ImportError("EXTRACT_BACKEND=llama_cpp needs llama-cpp-python: pip install llama-cpp-python") from e
+
+DEFAULT_MODEL_PATH = "models/Qwen3-1.7B-Q4_K_M.gguf"
+# Tokens per answer line: 【n】 and up to three MM:DD:HH:MM times
+TOKENS_PER_MESSAGE = 48
+
+# Global model, loaded on first use
+model = None
+model_key = None
+# A Llama context runs one evaluation at a time
+model_lock = threading.Lock()
+# Number of messages -> grammar with exactly that many answer lines
+grammars = {}
+
+ANSWER_GRAMMAR = '''
+answer ::= "none" | time ("-" time)*
+time ::= d d ":" d d ":" d d ":" d d
+d ::= [0-9]
+'''
+
+def cpu_threads(config):
+    """
+    Threads for decoding and for prompt processing
+
+    LLAMA_THREADS=0 picks the physical cores for decoding, which is memory
+    bound and slows down on hyper-threads, and all logical cores for prompt
+    processing, which is compute bound.
+
+    Returns:
+        (n_threads, n_threads_batch)
+    """
+    logical = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    threads = config.get('llama_threads', 0)
+    if threads > 0:
+        return threads, max(threads, logical)
+    return (logical // 2 if logical >= 4 else logical), logical
+
+def load_model(config):
+    """Load the GGUF model, again only when the path or thread count changed"""
+    global model, model_key
+
+    path = config.get('llama_model_path') or DEFAULT_MODEL_PATH
+    threads, threads_batch = cpu_threads(config)
+    key = (path, threads, config.get('llama_context', 4096))
+    if model is not None and model_key == key:
+        return model
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"GGUF model not found at {path}, set LLAMA_MODEL_PATH")
+
+    unload()
+    print(f"Loading {path} on CPU, {threads} threads ({threads_batch} for prompts)...")
+    with metrics.timer('llm_load', backend='llama_cpp'):
+        model = Llama(
+            model_path=path,
+            n_ctx=key[2],
+            n_threads=threads,
+            n_threads_batch=threads_batch,
+            verbose=False
+        )
+    model_key = key
+    print("Model loading completed")
+    return model
+
+def get_grammar(count):
+    """Grammar allowing exactly 【1】..【count】, one answer line each"""
+    if count not in grammars:
+        slots = ' '.join(f'"【{i}】" answer "\\n"' for i in range(1, count + 1))
+        grammars[count] = LlamaGrammar.from_string(f"root ::= {slots}\n{ANSWER_GRAMMAR}", verbose=False)
+    return grammars[count]
+
+def extract_packed(message_texts, prompt):
+    """
+    Run one packed prompt through the loaded model
+
+    Returns:
+        List of raw answers, same order as input
+    """
+    with metrics.timer('llm_cpu', messages=len(message_texts)) as run:
+        result = model.create_chat_completion(
+            messages=[{"role": "user", "content": build_batch_prompt(prompt, message_texts)}],
+            max_tokens=TOKENS_PER_MESSAGE * len(message_texts),
+            temperature=0.0,
+            grammar=get_grammar(len(message_texts))
+        )
+        usage = result.get('usage', {})
+        run['items'] = len(message_texts)
+        run['prompt_tokens'] = usage.get('prompt_tokens')
+        run['completion_tokens'] = usage.get('completion_tokens')
+    content = result['choices'][0]['message']['content']
+    print(f"Final content: {content}")
+    return parse_batch_answer(content, len(message_texts))
+
+def extract_time_info_batch_cpu(message_texts, config, batch_size=8, on_error=None):
+    """
+    Extract time information on the CPU, batch_size messages per prompt
+
+    Args:
+        message_texts: List of QQ group message texts to analyze
+        config: Configuration dictionary (LLAMA_* settings)
+        batch_size: Number of messages packed into one prompt
+        on_error: Value returned for messages whose prompt failed
+
+    Returns:
+        List of extracted time information strings (or None), same order as input
+    """
+    if not message_texts:
+        return []
+
+    prompt = load_prompt()
+    results = []
+    with model_lock:
+        try:
+            load_model(config)
+        except Exception as e:
+            # Missing GGUF file or llama.cpp failing to load it: the whole call fails
+            print(f"llama.cpp model could not be loaded: {e}")
+            return [on_error] * len(message_texts)
+        for start in range(0, len(message_texts), batch_size):
+            batch = message_texts[start:start + batch_size]
+            print(f"Batch {start // batch_size + 1}: {len(batch)} messages")
+            try:
+                answers = extract_packed(batch, prompt)
+            except Exception as e:
+                print(f"llama.cpp extraction failed: {e}")
+                results.extend([on_error] * len(batch))
+                continue
+            results.extend(clean_content(answer, check_format=True) for answer in answers)
+    return results
+
+def model_id(config):
+    return "llama_cpp:" + os.path.basename(config.get('llama_model_path') or DEFAULT_MODEL_PATH)
+
+def extract_batch(message_texts, config, on_error=None):
+    """Backend interface: packed prompts on the CPU model"""
+    return extract_time_info_batch_cpu(message_texts, config, config.get('batch_size', 8), on_error)
+
+def unload():
+    """Release the model and its KV cache"""
+    global model, model_key
+
+    if model is not None:
+        if hasattr(model, 'close'):
+            model.close()
+        model = None
+        model_key = None
+        grammars.clear()
+        gc.collect()
+        print("CPU model unloaded")
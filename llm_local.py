@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local Hugging Face backend: the model runs in this process (or in llm_worker.py)
+
+Imported only when EXTRACT_BACKEND=local (see llm.BACKENDS), so deployments
+that extract through the API never load torch and transformers.
+"""
+import os
+# 设置环境变量，强制离线模式
+os.environ["TRANSFORMERS_OFFLINE"] = "1"
+os.environ["HF_HUB_OFFLINE"] = "1"
+
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, StoppingCriteria, StoppingCriteriaList
+import torch
+import requests
+import copy
+import hashlib
+import time
+import metrics
+from llm import clean_content, load_prompt
+
+# Global variables to store model and tokenizer
+model = None
+tokenizer = None
+model_name = None
+# KV cache of the fixed prompt prefix: (key, prefix_ids, suffix_template, past_key_values)
+prefix_cache = None
+
+def load_model():
+    """Load model and tokenizer to GPU, execute only once"""
+    global model, tokenizer, model_name
+    
+    if model is not None and tokenizer is not None:
+        print("Model already loaded, skipping reload")
+        return
+    
+    print("Loading model to GPU...")
+    model_name = os.getenv('MODEL') or "Qwen/Qwen3-8B"
+
+    # Configure 4-bit quantization
+    quantization_config = BitsAndBytesConfig(
+        load_in_4bit=True,  # Enable 4-bit quantization
+        bnb_4bit_quant_type="nf4",  # Use NF4 data type, more friendly to normal distribution weights
+        bnb_4bit_compute_dtype=torch.float16,  # Use float16 for computation
+        bnb_4bit_use_double_quant=True,  # Enable nested quantization, saves additional ~0.5GB VRAM
+    )
+
+    # Load tokenizer and quantized model from local cache only
+    tokenizer = AutoTokenizer.from_pretrained(
+        model_name,
+        local_files_only=True  # 只从本地加载，不连接网络
+    )
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype="auto",
+        device_map="auto",
+        quantization_config=quantization_config,  # Key: pass quantization config
+        local_files_only=True  # 只从本地加载，不连接网络
+    )
+    print("Model loading completed")
+
+# Extraction modes of the local model (EXTRACT_THINKING in config.env):
+#   think       - full thinking phase, as the model does by default
+#   nothink     - thinking disabled, short answer only
+#   budget      - thinking capped at THINK_BUDGET tokens, then the answer is forced
+#   constrained - thinking disabled, output restricted to MM:DD:HH:MM(-...)|none
+EXTRACT_MODES = ('think', 'nothink', 'budget', 'constrained')
+# Enough tokens for several MM:DD:HH:MM times
+ANSWER_TOKENS = 64
+
+# Tokens that can appear in a constrained answer, built once per tokenizer
+grammar_vocab = None
+
+def get_extract_mode():
+    mode = os.getenv('EXTRACT_THINKING', 'think').lower()
+    return mode if mode in EXTRACT_MODES else 'think'
+
+def grammar_prefix_ok(text):
+    """Check whether text is a prefix of "none" or of MM:DD:HH:MM times joined by "-" """
+    if "none".startswith(text):
+        return True
+    template = "dd:dd:dd:dd-"
+    for i, char in enumerate(text):
+        expected = template[i % len(template)]
+        if expected == 'd' and not char.isdigit():
+            return False
+        if expected != 'd' and char != expected:
+            return False
+    return True
+
+def grammar_complete(text):
+    """Check whether text is a complete constrained answer"""
+    return text == "none" or (len(text) % 12 == 11 and grammar_prefix_ok(text))
+
+def get_grammar_vocab():
+    """Token ids whose text only uses characters of the answer grammar"""
+    global grammar_vocab
+    
+    if grammar_vocab is None:
+        allowed_chars = set("0123456789:-none")
+        grammar_vocab = []
+        for token_id in range(len(tokenizer)):
+            text = tokenizer.decode([token_id])
+            if text and set(text) <= allowed_chars:
+                grammar_vocab.append((token_id, text))
+    return grammar_vocab
+
+def get_eos_ids():
+    eos = model.generation_config.eos_token_id
+    eos = eos if isinstance(eos, list) else [eos]
+    return [token_id for token_id in eos if token_id is not None] or [tokenizer.eos_token_id]
+
+def build_chat_text(prompt, message_text, enable_thinking):
+    return tokenizer.apply_chat_template(
+        [{"role": "user", "content": prompt + "\n" + message_text}],
+        tokenize=False,
+        add_generation_prompt=True,
+        enable_thinking=enable_thinking  # Switches between thinking and non-thinking modes
+    )
+
+class FirstTokenTimer(StoppingCriteria):
+    """Record when the first new token is produced, i.e. when prefill is done"""
+    
+    def __init__(self):
+        self.first_token_time = None
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_time is None:
+            self.first_token_time = time.time()
+        return False
+
+def generate_ids(model_inputs, max_new_tokens, constrained=False, past_key_values=None):
+    """
+    Run model.generate on tokenized prompts, logging prefill and decode time
+    
+    Args:
+        model_inputs: Tokenized, left-padded prompts (input_ids, attention_mask)
+        max_new_tokens: Maximum number of generated tokens
+        constrained: Restrict the output to the answer grammar
+        past_key_values: KV cache of a prompt prefix shared by all rows
+        
+    Returns:
+        List of generated token id lists, one per prompt
+    """
+    # With left padding every row's prompt ends at the same column
+    input_length = model_inputs["input_ids"].shape[1]
+    
+    if constrained:
+        vocab = get_grammar_vocab()
+        eos_ids = get_eos_ids()
+        
+        def allowed_tokens(batch_id, input_ids):
+            text = tokenizer.decode(input_ids[input_length:], skip_special_tokens=True)
+            allowed = [token_id for token_id, token_text in vocab if grammar_prefix_ok(text + token_text)]
+            if grammar_complete(text) or not allowed:
+                # Early stop as soon as the answer is complete
+                allowed = allowed + eos_ids
+            return allowed
+        
+        generation_args = dict(do_sample=False, prefix_allowed_tokens_fn=allowed_tokens)
+    else:
+        generation_args = dict(
+            temperature=0.1,  # Lower temperature for more stable output
+            top_p=0.9,        # Nucleus sampling parameter
+            do_sample=True,   # Enable sampling
+            repetition_penalty=1.1  # Repetition penalty
+        )
+    if past_key_values is not None:
+        generation_args["past_key_values"] = past_key_values
+    
+    timer = FirstTokenTimer()
+    start = time.time()
+    generated_ids = model.generate(
+        **model_inputs,
+        max_new_tokens=max_new_tokens,
+        pad_token_id=tokenizer.pad_token_id,
+        stopping_criteria=StoppingCriteriaList([timer]),
+        **generation_args
+    )
+    end = time.time()
+    outputs = [row[input_length:].tolist() for row in generated_ids]
+    
+    first_token_time = timer.first_token_time or end
+    cached_length = past_key_values.get_seq_length() if past_key_values is not None else 0
+    print(f"Prefill {first_token_time - start:.3f}s ({input_length - cached_length} prompt tokens, {cached_length} cached), "
+          f"decode {end - first_token_time:.3f}s ({max(len(ids) for ids in outputs)} tokens)")
+    metrics.record('llm_prefill', first_token_time - start, len(outputs),
+                   prompt_tokens=input_length - cached_length, cached_tokens=cached_length)
+    metrics.record('llm_decode', end - first_token_time, len(outputs), tokens=max(len(ids) for ids in outputs))
+    return outputs
+
+def run_generate(texts, max_new_tokens, constrained=False):
+    """
+    Run model.generate on left-padded prompts
+    
+    Returns:
+        List of generated token id lists, one per prompt
+    """
+    model_inputs = tokenizer(texts, return_tensors="pt", padding=True).to(model.device)
+    return generate_ids(model_inputs, max_new_tokens, constrained)
+
+# Stands in for the message when splitting the chat template into prefix and suffix
+MESSAGE_PLACEHOLDER = "\x00MESSAGE\x00"
+
+def get_prefix_cache(prompt, enable_thinking):
+    """
+    Get the KV cache of the chat template prefix up to the message text
+    
+    The prefix (chat markup + prompt.txt) is the same for every message, so
+    it is encoded once and reused until prompt.txt or MODEL changes.
+    
+    Returns:
+        (prefix_ids, suffix_template, past_key_values)
+    """
+    global prefix_cache
+    
+    key = (model_name, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), enable_thinking)
+    if prefix_cache is None or prefix_cache[0] != key:
+        prefix_text, suffix_template = build_chat_text(prompt, MESSAGE_PLACEHOLDER, enable_thinking).split(MESSAGE_PLACEHOLDER)
+        prefix_ids = tokenizer(prefix_text, return_tensors="pt").input_ids.to(model.device)
+        start = time.time()
+        with torch.no_grad():
+            past_key_values = model(prefix_ids, use_cache=True).past_key_values
+        print(f"Prompt prefix cached: {prefix_ids.shape[1]} tokens in {time.time() - start:.3f}s")
+        prefix_cache = (key, prefix_ids, suffix_template, past_key_values)
+    return prefix_cache[1], prefix_cache[2], prefix_cache[3]
+
+def run_generate_cached(prompt, message_texts, enable_thinking, max_new_tokens, constrained=False):
+    """
+    Generate the answers for a batch of messages, reusing the cached prompt prefix
+    
+    Every row is the shared prefix, then padding, then its message and the
+    end of the chat template. The padding is masked out in the attention
+    mask, from which generate() derives the position ids, so each message
+    continues right after the prefix as if it were alone.
+    
+    Returns:
+        List of generated token id lists, one per message
+    """
+    prefix_ids, suffix_template, past_key_values = get_prefix_cache(prompt, enable_thinking)
+    suffixes = [tokenizer(text + suffix_template, add_special_tokens=False).input_ids for text in message_texts]
+    rows = len(suffixes)
+    width = max(len(ids) for ids in suffixes)
+    suffix_ids = torch.tensor([[tokenizer.pad_token_id] * (width - len(ids)) + ids for ids in suffixes], device=model.device)
+    suffix_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in suffixes], device=model.device)
+    model_inputs = {
+        "input_ids": torch.cat([prefix_ids.expand(rows, -1), suffix_ids], dim=1),
+        "attention_mask": torch.cat([torch.ones_like(prefix_ids).expand(rows, -1), suffix_mask], dim=1),
+    }
+    # generate() extends the cache in place, so every call gets its own copy, one row per message
+    cache = copy.deepcopy(past_key_values)
+    if rows > 1:
+        cache.batch_repeat_interleave(rows)
+    return generate_ids(model_inputs, max_new_tokens, constrained, cache)
+
+def generate_answers(message_texts, prompt, mode=None):
+    """
+    Generate raw answers for a batch of messages with the in-process model
+    
+    Args:
+        message_texts: List of QQ group message texts
+        prompt: Contents of prompt.txt
+        mode: One of EXTRACT_MODES, defaults to EXTRACT_THINKING
+        
+    Returns:
+        List of decoded answers, same order as input
+    """
+    mode = mode or get_extract_mode()
+    
+    # Decoder-only models must be padded on the left for batched generation
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    
+    enable_thinking = mode in ('think', 'budget')
+    texts = [build_chat_text(prompt, message_text, enable_thinking) for message_text in message_texts]
+    
+    max_new_tokens = {'think': 2048, 'budget': int(os.getenv('THINK_BUDGET', '256'))}.get(mode, ANSWER_TOKENS)
+    # Every row reuses the KV cache of the prompt prefix
+    outputs = run_generate_cached(prompt, message_texts, enable_thinking, max_new_tokens, mode == 'constrained')
+    
+    if mode == 'budget':
+        eos_ids = set(get_eos_ids())
+        # Rows that used up the budget: close the thinking block and force the answer
+        unfinished = [i for i, ids in enumerate(outputs) if not eos_ids & set(ids)]
+        if unfinished:
+            continuations = []
+            for i in unfinished:
+                thought = tokenizer.decode(outputs[i], skip_special_tokens=False)
+                closing = "" if "</think>" in thought else "\n</think>\n\n"
+                continuations.append(texts[i] + thought + closing)
+            for i, ids in zip(unfinished, run_generate(continuations, ANSWER_TOKENS)):
+                closing_ids = [] if "</think>" in tokenizer.decode(outputs[i]) else tokenizer.encode("\n</think>\n\n")
+                outputs[i] = outputs[i] + closing_ids + ids
+    
+    return [tokenizer.decode(ids, skip_special_tokens=True).strip("\n") for ids in outputs]
+
+def extract_time_info_local(message_text, mode=None):
+    """
+    Extract time information from message text with the in-process model
+    
+    Args:
+        message_text: QQ group message text to analyze
+        mode: One of EXTRACT_MODES, defaults to EXTRACT_THINKING
+        
+    Returns:
+        Extracted time information string
+    """
+    global model, tokenizer
+    
+    # Ensure model is loaded
+    if model is None or tokenizer is None:
+        load_model()
+    
+    prompt = load_prompt()
+    
+    content = generate_answers([message_text], prompt, mode)[0]
+    # Debug information
+    # print(f"Thinking content: {thinking_content[:100]}...")
+    print(f"Final content: {content}")
+    
+    return clean_content(content, check_format=True)
+
+def extract_time_info_batch_local(message_texts, batch_size=8, mode=None):
+    """
+    Extract time information from many messages with batched generation in-process
+    
+    Messages run through model.generate together, batch_size messages per
+    forward pass, all on top of the cached prompt prefix.
+    
+    Args:
+        message_texts: List of QQ group message texts to analyze
+        batch_size: Number of messages per generate() call
+        mode: One of EXTRACT_MODES, defaults to EXTRACT_THINKING
+        
+    Returns:
+        List of extracted time information strings (or None), same order as input
+    """
+    global model, tokenizer
+    
+    if not message_texts:
+        return []
+    
+    # Ensure model is loaded
+    if model is None or tokenizer is None:
+        load_model()
+    
+    prompt = load_prompt()
+    results = []
+    
+    for start in range(0, len(message_texts), batch_size):
+        batch = message_texts[start:start + batch_size]
+        print(f"Batch {start // batch_size + 1}: {len(batch)} messages")
+        
+        for content in generate_answers(batch, prompt, mode):
+            print(f"Final content: {content}")
+            results.append(clean_content(content, check_format=True))
+    
+    return results
+
+def call_worker(message_texts, worker_url, batch_size=8):
+    """
+    Extract time information through the model worker process (llm_worker.py)
+    
+    Args:
+        message_texts: List of QQ group message texts to analyze
+        worker_url: LLM_WORKER_URL of the worker
+        batch_size: Number of messages per generate() call in the worker
+        
+    Returns:
+        List of extracted time information strings (or None), same order as input
+        
+    Raises:
+        requests.RequestException: If the worker is down, busy past the timeout or fails
+    """
+    with metrics.timer('llm_worker') as run:
+        response = requests.post(
+            f"{worker_url.rstrip('/')}/extract",
+            json={"messages": message_texts, "batch_size": batch_size},
+            timeout=(2, 600)  # Fail fast if the worker is down, generation itself may be slow
+        )
+        response.raise_for_status()
+        run['items'] = len(message_texts)
+    return response.json()['results']
+
+def extract_time_info(message_text, config):
+    """
+    Extract time information from message text
+    
+    Uses the resident model worker when LLM_WORKER_URL is set, otherwise
+    loads the model in this process.
+    
+    Args:
+        message_text: QQ group message text to analyze
+        config: Configuration dictionary
+        
+    Returns:
+        Extracted time information string, None if the worker failed
+    """
+    return extract_time_info_batch([message_text], config)[0]
+
+def extract_time_info_batch(message_texts, config, on_error=None):
+    """
+    Extract time information from many messages with batched generation
+    
+    Uses the resident model worker when LLM_WORKER_URL is set, otherwise
+    loads the model in this process. A worker that cannot be connected to is
+    not running, so the model is loaded in-process then. A worker that is up
+    but times out or fails the request fails the batch: a second model next
+    to the worker's would not fit on the GPU. In-process, a failure only
+    fails its batch_size messages.
+    
+    Args:
+        message_texts: List of QQ group message texts to analyze
+        config: Configuration dictionary (BATCH_SIZE, LLM_WORKER_URL)
+        on_error: Value returned for messages whose extraction failed
+        
+    Returns:
+        List of extracted time information strings (or None), same order as input
+    """
+    if not message_texts:
+        return []
+    batch_size = config.get('batch_size', 8)
+    worker_url = config.get('llm_worker_url')
+    if worker_url:
+        try:
+            return call_worker(message_texts, worker_url, batch_size)
+        except requests.ConnectionError as e:
+            print(f"Model worker not running, loading model in-process: {e}")
+        except Exception as e:
+            print(f"Model worker failed, {len(message_texts)} messages left for the next run: {e}")
+            return [on_error] * len(message_texts)
+    
+    results = []
+    for start in range(0, len(message_texts), batch_size):
+        batch = message_texts[start:start + batch_size]
+        try:
+            results.extend(extract_time_info_batch_local(batch, batch_size))
+        except Exception as e:
+            print(f"Local extraction failed for {len(batch)} messages: {e}")
+            results.extend([on_error] * len(batch))
+    return results
+
+def unload_model():
+    """Unload model and tokenizer, release GPU memory"""
+    global model, tokenizer, grammar_vocab, prefix_cache
+    
+    grammar_vocab = None
+    prefix_cache = None
+    if model is not None:
+        del model
+        model = None
+        print("Model unloaded from GPU")
+    
+    if tokenizer is not None:
+        del tokenizer
+        tokenizer = None
+        print("Tokenizer unloaded")
+    
+    # Force garbage collection
+    import gc
+    gc.collect()
+    torch.cuda.empty_cache()  # Clear CUDA cache
+    print("GPU memory cleared")
+
+def model_id(config):
+    return config.get('model') or os.getenv('MODEL') or "Qwen/Qwen3-8B"
+
+def extract_batch(message_texts, config, on_error=None):
+    """Backend interface: the model worker if configured, otherwise the in-process model"""
+    return extract_time_info_batch(message_texts, config, on_error)
+
+def unload():
+    unload_model()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Long-lived model worker that keeps the local LLM resident between runs
+
+llm_local.extract_time_info / extract_time_info_batch send their messages here
+when LLM_WORKER_URL is set. If the worker is not running they load the model
+in-process; if it is running but times out or fails, the batch fails and is
+extracted again on the next run, so the scheduler never loads a second model
+next to the worker's. The model is loaded and warmed up at
+startup and unloaded after LLM_WORKER_IDLE_TIMEOUT seconds without requests;
+the next request loads it again.
+
+Usage:
+    python llm_worker.py
+"""
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import llm_local
+from loadconfig import load_config
+
+# The GPU runs one generate() at a time
+model_lock = threading.Lock()
+last_used = time.time()
+
+
+def extract(message_texts, batch_size):
+    """Run batched extraction on the resident model"""
+    global last_used
+
+    with model_lock:
+        results = llm_local.extract_time_info_batch_local(message_texts, batch_size)
+        last_used = time.time()
+    return results
+
+
+def warm_up():
+    """Load the model and run one short request so the first real request is fast"""
+    start = time.time()
+    extract(["收到"], 1)
+    logging.info(f"Model worker warmed up in {time.time() - start:.1f}s")
+
+
+def unload_when_idle(idle_timeout):
+    """Unload the model after idle_timeout seconds without requests"""
+    while True:
+        time.sleep(min(60, idle_timeout))
+        with model_lock:
+            if llm_local.model is not None and time.time() - last_used > idle_timeout:
+                logging.info(f"Model idle for {idle_timeout}s, unloading")
+                llm_local.unload_model()
+
+
+class WorkerHandler(BaseHTTPRequestHandler):
+    """POST /extract {"messages": [...], "batch_size": 8} -> {"results": [...]}, GET /health"""
+
+    def _reply(self, status, result):
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, {"status": "ok", "loaded": llm_local.model is not None, "idle_seconds": round(time.time() - last_used)})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != '/extract':
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            results = extract(request['messages'], int(request.get('batch_size', 8)))
+            self._reply(200, {"results": results})
+        except Exception as e:
+            logging.error(f"Extraction failed: {e}")
+            self._reply(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = load_config() or {}
+    host = config.get('llm_worker_host', '127.0.0.1')
+    port = config.get('llm_worker_port', 8090)
+    idle_timeout = config.get('llm_worker_idle_timeout', 1800)
+
+    warm_up()
+    # LLM_WORKER_IDLE_TIMEOUT=0 keeps the model loaded
+    if idle_timeout > 0:
+        threading.Thread(target=unload_when_idle, args=(idle_timeout,), daemon=True).start()
+
+    server = ThreadingHTTPServer((host, port), WorkerHandler)
+    logging.info(f"Model worker listening on {host}:{port}, idle timeout {idle_timeout}s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Model worker stopped")
+
+
+if __name__ == "__main__":
+    main()
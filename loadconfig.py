@@ -1,32 +1,224 @@
+"""
+Configuration from config.env
+
+load_config() parses config.env once and returns the cached dictionary
+until the file's mtime changes, so the many callers (every scheduled task,
+check_all, the work pipeline, the stream handler) cost one stat() each.
+On a change the file is re-read with override=True, so edited values replace
+the ones already in the environment, and the functions in reload_hooks are
+called with the old and the new dictionary. An invalid edit is reported, the
+environment is rolled back and the previous configuration stays in use, so
+modules reading os.getenv directly never see a rejected value.
+
+The returned dictionary is shared, callers must not modify it.
+"""
 import os
-from dotenv import load_dotenv
+import re
+import threading
+from dotenv import dotenv_values, load_dotenv
+from llm import BACKENDS
+
+# Extraction modes of llm_local, kept here so loading the config does not import torch
+EXTRACT_MODES = ('think', 'nothink', 'budget', 'constrained')
+
+# Called as hook(old_config, new_config) after config.env changed
+reload_hooks = []
+
+# Absolute path -> (mtime_ns, config dictionary or None)
+_cache = {}
+# Absolute path -> keys config.env set last time, removed keys are unset on reload
+_file_keys = {}
+_lock = threading.Lock()
+
+def get_int(name, default, minimum=0, errors=None):
+    """Integer environment variable, problems are appended to errors"""
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        errors.append(f"{name} must be an integer, got {value!r}")
+        return default
+    if number < minimum:
+        errors.append(f"{name} must be at least {minimum}, got {number}")
+        return default
+    return number
+
+def get_float(name, default, minimum=0, errors=None):
+    """Float environment variable, problems are appended to errors"""
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return float(default)
+    try:
+        number = float(value)
+    except ValueError:
+        errors.append(f"{name} must be a number, got {value!r}")
+        return float(default)
+    if number < minimum:
+        errors.append(f"{name} must be at least {minimum}, got {number}")
+        return float(default)
+    return number
+
+def get_bool(name, default, errors=None):
+    """true/false environment variable"""
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    if value.strip().lower() not in ('true', 'false'):
+        errors.append(f"{name} must be true or false, got {value!r}")
+        return default
+    return value.strip().lower() == 'true'
+
+def get_time(name, default, errors=None):
+    """HH:MM environment variable"""
+    value = (os.getenv(name) or default).strip()
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', value)
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        errors.append(f"{name} must be HH:MM, got {value!r}")
+        return default
+    return value
+
 def load_config(config_file="config.env"):
     """
     Load configuration from .env file using python-dotenv
     
+    The result is cached per file and only re-read when its mtime changes.
+    
     Args:
         config_file: Path to configuration file
         
     Returns:
-        Configuration dictionary
+        Configuration dictionary, None if the file was never valid
+    """
+    path = os.path.abspath(config_file)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        
+        # Unset the keys that were removed from the file, then let the file win
+        values = dotenv_values(path) if mtime is not None else {}
+        previous_keys = _file_keys.get(path, set())
+        previous_env = {key: os.environ.get(key) for key in previous_keys | set(values)}
+        for key in previous_keys - set(values):
+            os.environ.pop(key, None)
+        _file_keys[path] = set(values)
+        load_dotenv(path, override=True)
+        
+        config = read_config()
+        old = cached[1] if cached is not None else None
+        if config is None:
+            # Roll the environment back, nothing may pick up the rejected values
+            for key, value in previous_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            _file_keys[path] = previous_keys
+            if old is not None:
+                print("Config error, keeping the previous configuration")
+                config = old
+        _cache[path] = (mtime, config)
+    
+    if old is not None and config is not old:
+        changed = sorted(key for key in config if config[key] != old.get(key))
+        print(f"Configuration reloaded, changed: {', '.join(changed) or 'nothing'}")
+        for hook in reload_hooks:
+            try:
+                hook(old, config)
+            except Exception as e:
+                print(f"Config reload hook failed: {e}")
+    return config
+
+def read_config():
+    """
+    Build and validate the configuration from the environment
+    
+    Returns:
+        Configuration dictionary, None if a value is invalid
     """
-    # Load .env file
-    load_dotenv(config_file)
+    errors = []
     
     # Get environment variables
     token = os.getenv('TOKEN')
     group_ids_str = os.getenv('GROUP_IDS')
-    message_count = int(os.getenv('MESSAGE_COUNT', '20'))
-    work_time = os.getenv('WORK_TIME', '02:00')
-    send_time = os.getenv('SEND_TIME', '08:50')
+    message_count = get_int('MESSAGE_COUNT', 20, minimum=1, errors=errors)
+    work_time = get_time('WORK_TIME', '02:00', errors=errors)
+    send_time = get_time('SEND_TIME', '08:50', errors=errors)
     base_url = os.getenv('BASE_URL', 'http://localhost:3001')
+    batch_size = get_int('BATCH_SIZE', 8, minimum=1, errors=errors)
+    api_concurrency = get_int('API_CONCURRENCY', 4, minimum=1, errors=errors)
+    api_retries = get_int('API_RETRIES', 3, errors=errors)
+    cache_max_entries = get_int('CACHE_MAX_ENTRIES', 50000, minimum=1, errors=errors)
+    prefilter = get_bool('PREFILTER', True, errors=errors)
+    prefilter_min_samples = get_int('PREFILTER_MIN_SAMPLES', 50, errors=errors)
+    prefilter_max_fp_rate = get_float('PREFILTER_MAX_FP_RATE', 0.05, errors=errors)
+    remind_days = get_int('REMIND_DAYS', 1, errors=errors)
+    remind_leads = os.getenv('REMIND_LEADS', '24h,3h,30m')
+    send_node_chars = get_int('SEND_NODE_CHARS', 1000, minimum=1, errors=errors)
+    send_nodes_per_message = get_int('SEND_NODES_PER_MESSAGE', 20, minimum=2, errors=errors)
+    send_retry_base = get_int('SEND_RETRY_BASE', 60, minimum=1, errors=errors)
+    send_retry_max = get_int('SEND_RETRY_MAX', 3600, minimum=1, errors=errors)
+    retention_days = get_int('RETENTION_DAYS', 30, errors=errors)
+    fetch_page_size = get_int('FETCH_PAGE_SIZE', 50, minimum=1, errors=errors)
+    max_fetch_pages = get_int('MAX_FETCH_PAGES', 20, minimum=1, errors=errors)
+    fetch_concurrency = get_int('FETCH_CONCURRENCY', 4, minimum=1, errors=errors)
+    fetch_retries = get_int('FETCH_RETRIES', 2, errors=errors)
+    fetch_timeout = get_int('FETCH_TIMEOUT', 10, minimum=1, errors=errors)
+    pipeline_chunk_size = get_int('PIPELINE_CHUNK_SIZE', 256, minimum=1, errors=errors)
+    pipeline_queue_pages = get_int('PIPELINE_QUEUE_PAGES', 8, minimum=1, errors=errors)
+    backfill_page_size = get_int('BACKFILL_PAGE_SIZE', 100, minimum=1, errors=errors)
+    backfill_chunk_size = get_int('BACKFILL_CHUNK_SIZE', 1000, minimum=1, errors=errors)
+    backfill_rate = get_float('BACKFILL_RATE', 2, errors=errors)
+    expand_forward = get_bool('EXPAND_FORWARD', True, errors=errors)
+    image_ocr = get_bool('IMAGE_OCR', False, errors=errors)
+    reply_cache_size = get_int('REPLY_CACHE_SIZE', 5000, minimum=1, errors=errors)
+    ingest_mode = os.getenv('INGEST_MODE', 'batch').lower()
+    stream_host = os.getenv('STREAM_HOST', '127.0.0.1')
+    stream_port = get_int('STREAM_PORT', 8081, minimum=1, errors=errors)
+    stream_batch_size = get_int('STREAM_BATCH_SIZE', 16, minimum=1, errors=errors)
+    stream_flush_seconds = get_float('STREAM_FLUSH_SECONDS', 5, errors=errors)
+    stream_queue_size = get_int('STREAM_QUEUE_SIZE', 1000, minimum=1, errors=errors)
+    stream_secret = os.getenv('STREAM_SECRET')
+    napcat_probe_wait = get_float('NAPCAT_PROBE_WAIT', 5, errors=errors)
+    napcat_ready_timeout = get_float('NAPCAT_READY_TIMEOUT', 60, errors=errors)
+    llm_worker_url = os.getenv('LLM_WORKER_URL')
+    llm_worker_host = os.getenv('LLM_WORKER_HOST', '127.0.0.1')
+    llm_worker_port = get_int('LLM_WORKER_PORT', 8090, minimum=1, errors=errors)
+    llm_worker_idle_timeout = get_int('LLM_WORKER_IDLE_TIMEOUT', 1800, errors=errors)
+    extract_backend = os.getenv('EXTRACT_BACKEND', 'api').lower()
+    extract_thinking = os.getenv('EXTRACT_THINKING', 'think').lower()
+    llama_model_path = os.getenv('LLAMA_MODEL_PATH', 'models/Qwen3-1.7B-Q4_K_M.gguf')
+    llama_threads = get_int('LLAMA_THREADS', 0, errors=errors)
+    llama_context = get_int('LLAMA_CONTEXT', 4096, minimum=512, errors=errors)
+    think_budget = get_int('THINK_BUDGET', 256, errors=errors)
+    metrics_jsonl = os.getenv('METRICS_JSONL', '')
+    metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+    metrics_port = get_int('METRICS_PORT', 0, errors=errors)
     
     # Validate required fields
     if not token:
-        print("Error: TOKEN is required in config file")
-        return None
+        errors.append("TOKEN is required in config file")
     if not group_ids_str:
-        print("Error: GROUP_IDS is required in config file")
+        errors.append("GROUP_IDS is required in config file")
+    if ingest_mode not in ('batch', 'stream'):
+        errors.append(f"INGEST_MODE must be batch or stream, got {ingest_mode!r}")
+    if extract_backend not in BACKENDS:
+        errors.append(f"EXTRACT_BACKEND must be one of {', '.join(BACKENDS)}, got {extract_backend!r}")
+    if extract_thinking not in EXTRACT_MODES:
+        errors.append(f"EXTRACT_THINKING must be one of {', '.join(EXTRACT_MODES)}, got {extract_thinking!r}")
+    for part in remind_leads.split(','):
+        if part.strip() and not re.fullmatch(r'\s*\d+\s*[smhd]?\s*', part.lower()):
+            errors.append(f"REMIND_LEADS parts must look like 24h, 3h or 30m, got {part.strip()!r}")
+    if errors:
+        for error in errors:
+            print(f"Error: {error}")
         return None
     
     # Parse group IDs
@@ -46,14 +238,62 @@ def load_config(config_file="config.env"):
         "api": {
             "base_url": base_url,
             "token": token,
-            "timeout": 10
+            "timeout": fetch_timeout
         },
         "groups": groups,
         "send_id": send_id,
         "work_time": work_time,
         "send_time": send_time,
         "model": model,
-        "working_qq": working_qq
+        "working_qq": working_qq,
+        "batch_size": batch_size,
+        "api_concurrency": api_concurrency,
+        "api_retries": api_retries,
+        "cache_max_entries": cache_max_entries,
+        "prefilter": prefilter,
+        "prefilter_min_samples": prefilter_min_samples,
+        "prefilter_max_fp_rate": prefilter_max_fp_rate,
+        "remind_days": remind_days,
+        "remind_leads": remind_leads,
+        "send_node_chars": send_node_chars,
+        "send_nodes_per_message": send_nodes_per_message,
+        "send_retry_base": send_retry_base,
+        "send_retry_max": send_retry_max,
+        "retention_days": retention_days,
+        "fetch_page_size": fetch_page_size,
+        "max_fetch_pages": max_fetch_pages,
+        "fetch_concurrency": fetch_concurrency,
+        "fetch_retries": fetch_retries,
+        "pipeline_chunk_size": pipeline_chunk_size,
+        "pipeline_queue_pages": pipeline_queue_pages,
+        "backfill_page_size": backfill_page_size,
+        "backfill_chunk_size": backfill_chunk_size,
+        "backfill_rate": backfill_rate,
+        "expand_forward": expand_forward,
+        "image_ocr": image_ocr,
+        "reply_cache_size": reply_cache_size,
+        "ingest_mode": ingest_mode,
+        "stream_host": stream_host,
+        "stream_port": stream_port,
+        "stream_batch_size": stream_batch_size,
+        "stream_flush_seconds": stream_flush_seconds,
+        "stream_queue_size": stream_queue_size,
+        "stream_secret": stream_secret,
+        "napcat_probe_wait": napcat_probe_wait,
+        "napcat_ready_timeout": napcat_ready_timeout,
+        "llm_worker_url": llm_worker_url,
+        "llm_worker_host": llm_worker_host,
+        "llm_worker_port": llm_worker_port,
+        "llm_worker_idle_timeout": llm_worker_idle_timeout,
+        "extract_backend": extract_backend,
+        "extract_thinking": extract_thinking,
+        "llama_model_path": llama_model_path,
+        "llama_threads": llama_threads,
+        "llama_context": llama_context,
+        "think_budget": think_budget,
+        "metrics_jsonl": metrics_jsonl,
+        "metrics_host": metrics_host,
+        "metrics_port": metrics_port
     }
     
     return config
\ No newline at end of file
@@ -8,14 +8,16 @@ Requires installation: pip install apscheduler
 
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from work import work
-from send import check_all
-from loadconfig import load_config
-from datebase import iter_data
+import stream
+from send import check_all, retry_pending
+from loadconfig import load_config, reload_hooks
+from datebase import iter_data, archive_expired
+from napcat import ensure_ready
+import metrics
+from reminders import ReminderScheduler, parse_leads
 import logging
-import subprocess
-import time
-import requests
 
 # Configure logging
 logging.basicConfig(
@@ -27,47 +29,19 @@ logging.basicConfig(
     ]
 )
 
-def wait_for_api_ready(base_url="http://localhost:3001", max_wait=30):
-    """
-    Wait for napcat API to be ready
-    
-    Args:
-        base_url: API base URL
-        max_wait: Maximum wait time in seconds
-        
-    Returns:
-        bool: True if API is ready, False if timeout
-    """
-    logging.info("Waiting for napcat API to be ready...")
-    start_time = time.time()
-    
-    while time.time() - start_time < max_wait:
-        try:
-            # Try to connect to the API
-            response = requests.get(f"{base_url}/get_group_msg_history", timeout=2)
-            if response.status_code == 200:
-                logging.info("Napcat API is ready!")
-                return True
-        except:
-            pass
-        
-        time.sleep(1)
-    
-    logging.warning(f"API not ready after {max_wait} seconds, proceeding anyway...")
-    return False
+# Running reminder scheduler, None while REMIND_LEADS is empty
+reminders = None
 
 def run_work_task():
     """Execute work task"""
     try:
-        working_qq = load_config().get('working_qq')
-        subprocess.run(['sudo','napcat','stop'])
-        time.sleep(5)
-        subprocess.run(['sudo','napcat','start',working_qq])
-        time.sleep(5)
-        # Wait for napcat API to be ready
-        # wait_for_api_ready(load_config().get('api', {}).get('base_url'))
+        # Probe NapCat, restart it only if it does not answer
+        if not ensure_ready(load_config()):
+            logging.error("NapCat not ready, skipping task")
+            return
     except Exception as e:
-        logging.error(f"Napcat stop and start failed: {e}")
+        logging.error(f"Napcat readiness check failed: {e}")
+        return
     try:
         logging.info("Work task started")
         work()
@@ -78,24 +52,84 @@ def run_work_task():
 def run_send_task():
     """Execute send task"""
     try:
-        working_qq = load_config().get('working_qq')
-        subprocess.run(['sudo','napcat','stop'])
-        time.sleep(5)
-        subprocess.run(['sudo','napcat','start',working_qq])
-        time.sleep(5)
-        # Wait for napcat API to be ready
-        # wait_for_api_ready(load_config().get('api', {}).get('base_url'))
+        # Probe NapCat, restart it only if it does not answer
+        if not ensure_ready(load_config()):
+            logging.error("NapCat not ready, skipping task")
+            return
     except Exception as e:
-        logging.error(f"Napcat stop and start failed: {e}")
+        logging.error(f"Napcat readiness check failed: {e}")
+        return
+    # While the reminder scheduler runs it sends per deadline, the daily digest is off
+    if reminders is None:
+        try:
+            logging.info("Send task started")
+            check_all()
+            logging.info("Send task completed")
+        except Exception as e:
+            logging.error(f"Send task failed: {e}")
     try:
-        logging.info("Send task started")
-        check_all()
-        logging.info("Send task completed")
+        # Retention: keep the reminder tables small
+        archived = archive_expired((load_config() or {}).get('retention_days', 30))
+        logging.info(f"Archived {archived} expired records")
     except Exception as e:
-        logging.error(f"Send task failed: {e}")
+        logging.error(f"Archive task failed: {e}")
+
+def run_retry_task():
+    """Retry queued messages whose backoff has elapsed, pick up deadlines stored elsewhere"""
+    try:
+        delivered = retry_pending()
+        if delivered:
+            logging.info(f"Retry task delivered {delivered} queued messages")
+    except Exception as e:
+        logging.error(f"Retry task failed: {e}")
+    try:
+        if reminders is not None:
+            reminders.refresh()
+    except Exception as e:
+        logging.error(f"Reminder refresh failed: {e}")
+
+def watch_config(scheduler):
+    """Reschedule the daily jobs in place when WORK_TIME or SEND_TIME change in config.env"""
+    def reschedule(old, new):
+        for job_id, key in (('work_task', 'work_time'), ('send_task', 'send_time')):
+            if new.get(key) != old.get(key):
+                hour, minute = map(int, new[key].split(':'))
+                scheduler.reschedule_job(job_id, trigger=CronTrigger(hour=hour, minute=minute))
+                logging.info(f"Rescheduled {job_id} to {new[key]}")
+    reload_hooks.append(reschedule)
+    reload_hooks.append(switch_reminders)
+
+def switch_reminders(old, new):
+    """Start, stop or re-queue the reminder scheduler when REMIND_LEADS changes"""
+    global reminders
+    
+    if reminders is not None:
+        reminders.config = new
+    if new.get('remind_leads') == old.get('remind_leads'):
+        return
+    leads = parse_leads(new.get('remind_leads'))
+    if not leads:
+        if reminders is not None:
+            reminders.stop()
+            reminders = None
+            logging.info("REMIND_LEADS cleared, reminder scheduler stopped, daily digest on")
+    elif reminders is None:
+        reminders = ReminderScheduler(new, leads).start()
+        logging.info("REMIND_LEADS set, reminder scheduler started, daily digest off")
+    else:
+        reminders.set_leads(leads)
+
+def run_config_task():
+    """Check config.env for changes, load_config only re-reads it when its mtime changed"""
+    try:
+        load_config()
+    except Exception as e:
+        logging.error(f"Config check failed: {e}")
 
 def main():
     """Main function"""
+    global reminders
+    
     config = load_config()
     if config is None:
         logging.error("Config error, cannot start")
@@ -126,6 +160,35 @@ def main():
         name='Send Task'
     )
     
+    # config.env edits apply without a restart: jobs are rescheduled, GROUP_IDS apply on the next fetch
+    watch_config(scheduler)
+    scheduler.add_job(
+        run_config_task,
+        IntervalTrigger(seconds=30),
+        id='config_task',
+        name='Config Task'
+    )
+    
+    # Failed sends wait in the database queue, retried every minute and after a restart
+    scheduler.add_job(
+        run_retry_task,
+        IntervalTrigger(minutes=1),
+        id='retry_task',
+        name='Retry Task'
+    )
+    run_retry_task()
+    
+    # JSON-lines stage log and the optional /metrics endpoint
+    metrics.configure(config)
+    
+    # Reminders at each lead time before every deadline
+    if parse_leads(config.get('remind_leads')):
+        reminders = ReminderScheduler(config).start()
+    
+    # Real-time ingestion runs next to the scheduled batch job, which stays as a fallback
+    if config.get('ingest_mode') == 'stream':
+        stream.start_stream(config)
+    
     logging.info(f"Minimal Scheduler started - Work: {work_time}, Send: {send_time}")
     
     try:
@@ -0,0 +1,167 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Metric values of the current process, keyed by (name, labels)
+counters = {}
+gauges = {}
+# (name, labels) -> [bucket counts, sum, count]
+histograms = {}
+_lock = threading.Lock()
+
+# Upper bounds in seconds, from a SQLite write to a full think-mode generation
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Structured stage log, one JSON object per line, appended without rotation;
+# off (None) unless METRICS_JSONL is set
+jsonl_path = None
+_jsonl_lock = threading.Lock()
+_server = None
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """Add value to a counter"""
+    with _lock:
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to value"""
+    with _lock:
+        gauges[_key(name, labels)] = value
+
+def observe(name, value, **labels):
+    """Add one observation to a histogram"""
+    with _lock:
+        key = _key(name, labels)
+        if key not in histograms:
+            histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        histogram = histograms[key]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram[0][i] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+def log_event(event, **fields):
+    """Append one structured event to the JSON-lines log"""
+    if not jsonl_path:
+        return
+    line = json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, ensure_ascii=False, default=str)
+    with _jsonl_lock:
+        with open(jsonl_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+def record(stage, seconds, items=None, **fields):
+    """
+    Record one run of a pipeline stage
+
+    Args:
+        stage: Stage name, e.g. fetch, parse, dedup, llm_api, store, send
+        seconds: Duration of the run
+        items: Number of messages (or records) the run handled
+        fields: Extra context for the JSON-lines log only, e.g. group_id
+    """
+    observe('stage_duration_seconds', seconds, stage=stage)
+    inc('stage_runs_total', stage=stage)
+    if items is not None:
+        inc('stage_items_total', items, stage=stage)
+    log_event('stage', stage=stage, seconds=round(seconds, 4), items=items, **fields)
+
+@contextlib.contextmanager
+def timer(stage, **fields):
+    """
+    Time a block as one run of a pipeline stage
+
+    The yielded dict can be filled inside the block: 'items' is counted,
+    everything else goes to the JSON-lines log.
+
+    Example:
+        with metrics.timer('fetch', group_id=group_id) as run:
+            messages = ...
+            run['items'] = len(messages)
+    """
+    run = {}
+    start = time.perf_counter()
+    try:
+        yield run
+    except Exception as e:
+        run['error'] = type(e).__name__
+        inc('stage_errors_total', stage=stage)
+        raise
+    finally:
+        items = run.pop('items', None)
+        record(stage, time.perf_counter() - start, items, **fields, **run)
+
+def _format(name, labels, value):
+    if labels:
+        label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+        return f'{name}{{{label_text}}} {value}'
+    return f'{name} {value}'
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            seen = set()
+            for (name, labels), value in sorted(values.items()):
+                if name not in seen:
+                    lines.append(f'# TYPE {name} {kind}')
+                    seen.add(name)
+                lines.append(_format(name, labels, value))
+        seen = set()
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            if name not in seen:
+                lines.append(f'# TYPE {name} histogram')
+                seen.add(name)
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                lines.append(_format(f'{name}_bucket', labels + (('le', bound),), bucket_count))
+            lines.append(_format(f'{name}_bucket', labels + (('le', '+Inf'),), count))
+            lines.append(_format(f'{name}_sum', labels, round(total, 6)))
+            lines.append(_format(f'{name}_count', labels, count))
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path='metrics.prom'):
+    """Write all metrics to a file, e.g. for node_exporter's textfile collector"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(path + '.tmp', path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def configure(config):
+    """
+    Apply the metrics settings of the configuration
+
+    Sets the JSON-lines log path and starts the /metrics endpoint once if
+    METRICS_PORT is set.
+
+    Args:
+        config: Configuration dictionary
+    """
+    global jsonl_path, _server
+    jsonl_path = config.get('metrics_jsonl') or None
+    port = config.get('metrics_port', 0)
+    if port and _server is None:
+        _server = ThreadingHTTPServer((config.get('metrics_host', '127.0.0.1'), port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
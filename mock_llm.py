@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local mock of an OpenAI-compatible chat completions endpoint
+
+Answers like the extraction prompt expects (MM:DD:HH:MM or none), using the
+rule-based extractor, after a configurable latency. Packed batch prompts
+(【编号】 slots, see llm.BATCH_INSTRUCTION) get one answer line per slot.
+
+Usage:
+    python mock_llm.py --port 8000 --latency 2.0
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prefilter import quick_extract
+
+SLOT = re.compile(r'\n【(\d+)】')
+
+
+def answer(content):
+    """Build the model answer for one user prompt"""
+    slots = SLOT.split(content)
+    if len(slots) > 1:
+        # slots = [prompt, "1", message1, "2", message2, ...]
+        lines = []
+        for number, message in zip(slots[1::2], slots[2::2]):
+            lines.append(f"【{number}】{quick_extract(message) or 'none'}")
+        return '\n'.join(lines)
+    return quick_extract(content.rsplit('\n', 1)[-1]) or 'none'
+
+
+class MockLLM:
+    """Request counter and latency of the mock endpoint"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def serve(mock, host='127.0.0.1', port=8000):
+    """
+    Serve the mock endpoint in a background thread
+
+    Returns:
+        ThreadingHTTPServer, call shutdown() to stop
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            with mock.lock:
+                mock.requests += 1
+            if mock.latency:
+                time.sleep(mock.latency)
+            content = body.get('messages', [{}])[-1].get('content', '')
+            result = {
+                'id': f'mock-{mock.requests}',
+                'object': 'chat.completion',
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer(content)}, 'finish_reason': 'stop'}],
+            }
+            data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions endpoint")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds per request")
+    args = parser.parse_args()
+
+    server = serve(MockLLM(args.latency), args.host, args.port)
+    print(f"Mock LLM listening on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
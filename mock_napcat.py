@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local mock of the NapCat HTTP API for testing without QQ
+
+Serves get_group_msg_history from a synthetic history (with some replies,
+merged forwards and files) and get_forward_msg, accepts
+send_private_forward_msg and get_login_info, and can push group message
+events to the stream ingestion endpoint.
+
+Usage:
+    python mock_napcat.py --port 3001 --groups 534116547,914404708 --history 1000
+    python mock_napcat.py --push http://127.0.0.1:8081/ --groups 534116547 --events 50
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_TEXTS = [
+    "各位同学大家好，请于{month}月{day}日{hour}:00前提交报名表。",
+    "明天下午在{room}开会，具体时间另行通知",
+    "下周{weekday}交实验报告，{room}收",
+    "收到",
+    "今天食堂人好多",
+    "作业截止时间为{month}月{day}日晚22:00，请按时提交。",
+    "有人一起去图书馆吗",
+    "@全体成员 {month}月{day}日进行体测，请大家准时参加",
+]
+
+
+def sample_text(rng):
+    return rng.choice(SAMPLE_TEXTS).format(month=rng.randint(1, 12), day=rng.randint(1, 28), hour=rng.randint(8, 22),
+                                           weekday=rng.choice('一二三四五'), room=f"{rng.choice('ABCD')}{rng.randint(101, 999)}")
+
+
+def make_message(group_id, seq, rng, timestamp=None):
+    """Build one synthetic group message in NapCat's array format"""
+    segments = [{'type': 'text', 'data': {'text': sample_text(rng)}}]
+    kind = rng.random()
+    if kind < 0.1 and seq > 1:
+        # Reply to the previous message
+        segments.insert(0, {'type': 'reply', 'data': {'id': str(int(group_id) % 100000 * 1000000 + seq - 1)}})
+    elif kind < 0.15:
+        segments = [{'type': 'forward', 'data': {'id': f'{group_id}-{seq}'}}]
+    elif kind < 0.2:
+        segments.append({'type': 'file', 'data': {'file': f'作业{seq % 10}_截止{rng.randint(1, 12)}月{rng.randint(1, 28)}日.pdf'}})
+    return {
+        'self_id': 10000,
+        'user_id': 20000 + seq % 50,
+        'time': int(timestamp if timestamp is not None else time.time()),
+        'message_id': int(group_id) % 100000 * 1000000 + seq,
+        'message_seq': seq,
+        'real_id': seq,
+        'message_type': 'group',
+        'post_type': 'message',
+        'group_id': int(group_id),
+        'sender': {'user_id': 20000 + seq % 50, 'nickname': f'user{seq % 50}', 'card': ''},
+        'message': segments,
+        'message_format': 'array',
+    }
+
+
+class MockNapCat:
+    """Synthetic message history of several groups, generated on demand"""
+
+    def __init__(self, group_ids, history=1000, seed=0, latency=0.0):
+        self.seed = seed
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.start_time = time.time() - history * 60
+        # Messages are rebuilt from (group, seq), only the history length is stored
+        self.sizes = {str(group_id): history for group_id in group_ids}
+        self.sent = []
+        self.requests = 0
+
+    def message(self, group_id, seq):
+        rng = random.Random(f"{self.seed}:{group_id}:{seq}")
+        return make_message(group_id, seq, rng, self.start_time + seq * 60)
+
+    def add_message(self, group_id):
+        """Append a new message to a group's history and return it"""
+        with self.lock:
+            group_id = str(group_id)
+            self.sizes[group_id] = self.sizes.get(group_id, 0) + 1
+            seq = self.sizes[group_id]
+        return self.message(group_id, seq)
+
+    def get_group_msg_history(self, payload):
+        group_id = str(payload.get('group_id'))
+        size = self.sizes.get(group_id, 0)
+        count = int(payload.get('count', 20))
+        seq = payload.get('message_seq')
+        end = size if seq in (None, '', 0, '0') else min(size, int(seq))
+        seqs = range(max(1, end - count + 1), end + 1) if count else []
+        return {'status': 'ok', 'retcode': 0, 'data': {'messages': [self.message(group_id, s) for s in seqs]}}
+
+    def handle(self, path, payload):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if path == '/get_group_msg_history':
+            return self.get_group_msg_history(payload)
+        if path == '/get_forward_msg':
+            rng = random.Random(f"{self.seed}:forward:{payload.get('message_id')}")
+            nodes = [{'sender': {'nickname': f'user{i}'}, 'message': [{'type': 'text', 'data': {'text': sample_text(rng)}}]}
+                     for i in range(rng.randint(2, 4))]
+            return {'status': 'ok', 'retcode': 0, 'data': {'messages': nodes}}
+        if path == '/send_private_forward_msg':
+            with self.lock:
+                self.sent.append(payload)
+            return {'status': 'ok', 'retcode': 0, 'data': {'message_id': len(self.sent)}}
+        if path == '/get_login_info':
+            return {'status': 'ok', 'retcode': 0, 'data': {'user_id': 10000, 'nickname': 'mock'}}
+        return None
+
+
+def serve(napcat, host='127.0.0.1', port=3001):
+    """
+    Serve the mock API in a background thread
+
+    Returns:
+        ThreadingHTTPServer, call shutdown() to stop
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            payload = json.loads(body or b'{}')
+            result = napcat.handle(self.path.split('?')[0], payload)
+            if result is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def push_events(napcat, target_url, group_ids, count, interval=0.0, secret=None):
+    """
+    Post new group messages to a stream ingestion endpoint like NapCat's HTTP reporting
+
+    Returns:
+        Number of events accepted
+    """
+    accepted = 0
+    for i in range(count):
+        event = napcat.add_message(group_ids[i % len(group_ids)])
+        body = json.dumps(event, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if secret:
+            headers['X-Signature'] = 'sha1=' + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+        request = urllib.request.Request(target_url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                accepted += response.status < 300
+        except Exception as e:
+            print(f"Push failed: {e}")
+        if interval:
+            time.sleep(interval)
+    return accepted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock NapCat HTTP API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3001)
+    parser.add_argument('--groups', default='534116547,914404708')
+    parser.add_argument('--history', type=int, default=1000, help="Messages per group")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--push', help="Stream endpoint to post events to instead of serving")
+    parser.add_argument('--events', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.05)
+    parser.add_argument('--secret')
+    args = parser.parse_args()
+
+    group_ids = [group_id.strip() for group_id in args.groups.split(',') if group_id.strip()]
+    napcat = MockNapCat(group_ids, args.history, latency=args.latency)
+    if args.push:
+        accepted = push_events(napcat, args.push, group_ids, args.events, args.interval, args.secret)
+        print(f"Pushed {args.events} events, {accepted} accepted")
+    else:
+        server = serve(napcat, args.host, args.port)
+        print(f"Mock NapCat listening on {args.host}:{args.port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
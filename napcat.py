@@ -0,0 +1,94 @@
+import logging
+import subprocess
+import time
+import requests
+import metrics
+
+def probe(config):
+    """
+    Check whether the NapCat API answers and is logged in
+
+    Args:
+        config: Configuration dictionary
+
+    Returns:
+        bool: True if get_login_info succeeds
+    """
+    api_config = config.get('api', {})
+    base_url = api_config.get('base_url', 'http://localhost:3001')
+    token = api_config.get('token', '1145141919810')
+    try:
+        response = requests.post(
+            f"{base_url}/get_login_info",
+            headers={'Authorization': f'Bearer {token}'},
+            json={},
+            timeout=3
+        )
+        return response.status_code == 200 and response.json().get('status') == 'ok'
+    except Exception:
+        return False
+
+def wait_for_api_ready(config, max_wait=60, first_delay=0.5, max_delay=8):
+    """
+    Probe NapCat with exponential backoff until it is ready
+
+    Args:
+        config: Configuration dictionary
+        max_wait: Maximum wait time in seconds
+        first_delay: Wait before the second probe, doubled after each failure
+        max_delay: Upper bound of the wait between probes
+
+    Returns:
+        bool: True if API is ready, False if timeout
+    """
+    start_time = time.time()
+    delay = first_delay
+    while True:
+        if probe(config):
+            return True
+        metrics.inc('napcat_probe_failures_total')
+        if time.time() - start_time + delay > max_wait:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+def restart(config):
+    """Restart NapCat with the working QQ account"""
+    working_qq = config.get('working_qq')
+    logging.warning("NapCat not ready, restarting...")
+    subprocess.run(['sudo', 'napcat', 'stop'])
+    subprocess.run(['sudo', 'napcat', 'start', working_qq])
+    metrics.inc('napcat_restarts_total')
+
+def ensure_ready(config):
+    """
+    Make sure NapCat is ready before a job uses it
+
+    Probes first and restarts NapCat only if the probes fail, then waits
+    for it to come back. Restart count and time-to-ready are exported to
+    metrics.prom.
+
+    Args:
+        config: Configuration dictionary
+
+    Returns:
+        bool: True if NapCat is ready
+    """
+    start_time = time.time()
+    ready = wait_for_api_ready(config, max_wait=config.get('napcat_probe_wait', 5))
+    if not ready:
+        restart_time = time.time()
+        restart(config)
+        ready = wait_for_api_ready(config, max_wait=config.get('napcat_ready_timeout', 60))
+        metrics.inc('napcat_restart_seconds_total', time.time() - restart_time)
+
+    time_to_ready = time.time() - start_time
+    metrics.set_gauge('napcat_ready', 1 if ready else 0)
+    metrics.set_gauge('napcat_time_to_ready_seconds', round(time_to_ready, 3))
+    metrics.write_prometheus()
+
+    if ready:
+        logging.info(f"NapCat ready after {time_to_ready:.1f}s")
+    else:
+        logging.error(f"NapCat not ready after {time_to_ready:.1f}s")
+    return ready
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rule-based pre-filter in front of the LLM extraction
+
+Messages without any date/time-like token are answered with None directly,
+messages with only explicit absolute dates are converted to MM:DD:HH:MM
+directly, everything else goes to the LLM.
+
+The direct conversion (fast path) does not know the prompt's "only tasks and
+deadlines" rule, so it stays off until enough of its answers were checked
+against the LLM: meanwhile those messages go to the LLM and both answers are
+kept in cache.db. It turns on once at least PREFILTER_MIN_SAMPLES were checked
+and the LLM answered none for at most PREFILTER_MAX_FP_RATE of them.
+
+Run this file to measure the pre-filter against the historical LLM results
+in output/qq_messages_analysis_*.txt, qq.db and those checked samples.
+"""
+
+import re
+import glob
+import sqlite3
+
+import extract_cache
+from loadconfig import load_config
+
+# 具体日期：9月17日、2025年9月24日、10月1号
+ABSOLUTE_DATE = re.compile(r'(?:(\d{4})\s*年\s*)?(\d{1,2})\s*月\s*(\d{1,2})\s*[日号]')
+# 数字日期：2025-10-02、2025/10/2、2025.10.2
+NUMERIC_DATE = re.compile(r'(?<!\d)(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?!\d)')
+# 短数字日期：10/8、10.8截止（只送LLM，不做直接转换，可能是版本号或小数）
+SHORT_DATE = re.compile(r'(?<![\d./-])(1[0-2]|0?[1-9])[/.](3[01]|[12]\d|0?[1-9])(?![\d./])')
+# 具体时刻：18:00、17：00、下午5点、中午12点半
+CLOCK_TIME = re.compile(r'(上午|早上|早|中午|下午|晚上|今晚|晚)?\s*(?<!\d)(\d{1,2})\s*(?:[:：]\s*(\d{2})(?!\d)|点\s*(半|\d{1,2}\s*分)?)')
+# 相对时间及中文数字日期/时刻
+RELATIVE_WORDS = re.compile(
+    r'今天|今日|今晚|今早|明天|明日|明早|明晚|后天|大后天|昨天|'
+    r'(?:下|本|这|上)?(?:周|星期|礼拜)[一二三四五六日天末]|下周|本周|这周|月底|月初|'
+    r'[一二三四五六七八九十]+月[一二三四五六七八九十]+[日号]|'
+    r'[一二三四五六七八九十]+点'
+)
+# 日期后时刻的最大距离（如“10月9日（周四）下午17：00”）
+TIME_WINDOW = 12
+
+
+def has_time_candidate(message_text):
+    """
+    Check whether a message contains any date/time-like expression
+
+    Args:
+        message_text: QQ group message text
+
+    Returns:
+        True if the message has to be looked at by the LLM or quick_extract
+    """
+    return bool(
+        ABSOLUTE_DATE.search(message_text)
+        or NUMERIC_DATE.search(message_text)
+        or SHORT_DATE.search(message_text)
+        or CLOCK_TIME.search(message_text)
+        or RELATIVE_WORDS.search(message_text)
+    )
+
+
+def _clock_value(match):
+    """Convert a CLOCK_TIME match to (hour, minute), None if not a valid time"""
+    period, hour, minute, suffix = match.group(1), int(match.group(2)), match.group(3), match.group(4)
+    if minute is not None:
+        minute = int(minute)
+    elif suffix and suffix.startswith('半'):
+        minute = 30
+    elif suffix:
+        minute = int(suffix.rstrip('分').strip())
+    else:
+        minute = 0
+    if period in ('下午', '晚上', '今晚', '晚') and hour < 12:
+        hour += 12
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def quick_extract(message_text):
+    """
+    Extract time information without the LLM when the message is unambiguous
+
+    A message is unambiguous when it has at least one explicit absolute date,
+    every clock time follows a date closely, and every relative word
+    (明天, 周五...) sits right next to an explicit date.
+
+    Args:
+        message_text: QQ group message text
+
+    Returns:
+        Time information string in the LLM format (MM:DD:HH:MM-...), or None
+        if the message has to go to the LLM
+    """
+    dates = []
+    for match in ABSOLUTE_DATE.finditer(message_text):
+        dates.append((match.start(), match.end(), int(match.group(2)), int(match.group(3))))
+    for match in NUMERIC_DATE.finditer(message_text):
+        dates.append((match.start(), match.end(), int(match.group(2)), int(match.group(3))))
+    if not dates:
+        return None
+    dates.sort()
+
+    for start, end, month, day in dates:
+        if not (1 <= month <= 12 and 1 <= day <= 31):
+            return None
+
+    # 相对时间必须紧挨着具体日期，否则交给LLM
+    for match in RELATIVE_WORDS.finditer(message_text):
+        if not any(match.start() - TIME_WINDOW <= end and match.end() + TIME_WINDOW >= start
+                   for start, end, month, day in dates):
+            return None
+
+    # 每个时刻都必须属于前面最近的日期
+    date_times = {}
+    for match in CLOCK_TIME.finditer(message_text):
+        value = _clock_value(match)
+        if value is None:
+            return None
+        owner = None
+        for index, (start, end, month, day) in enumerate(dates):
+            if end <= match.start() and match.start() - end <= TIME_WINDOW:
+                owner = index
+        if owner is None or owner in date_times:
+            return None
+        date_times[owner] = value
+
+    times = []
+    for index, (start, end, month, day) in enumerate(dates):
+        hour, minute = date_times.get(index, (0, 0))
+        time_info = f"{month:02d}:{day:02d}:{hour:02d}:{minute:02d}"
+        if time_info not in times:
+            times.append(time_info)
+    return '-'.join(times)
+
+
+def false_positives(samples):
+    """
+    Count fast path answers the LLM answered with none
+
+    Args:
+        samples: List of (message, fast path answer, LLM answer or None)
+
+    Returns:
+        (false_positives, total)
+    """
+    return sum(llm is None for message, quick, llm in samples), len(samples)
+
+
+def fast_path_allowed(config, samples=None):
+    """Whether the checked samples show an acceptable false-positive rate"""
+    rejected, total = false_positives(extract_cache.load_samples() if samples is None else samples)
+    return total >= config.get('prefilter_min_samples', 50) and rejected <= total * config.get('prefilter_max_fp_rate', 0.05)
+
+
+def prefilter(message_text, fast_path=True):
+    """
+    Run the pre-filter on one message
+
+    Args:
+        message_text: QQ group message text
+        fast_path: Answer explicit dates directly instead of asking the LLM
+
+    Returns:
+        (needs_llm, time_info): needs_llm is False when time_info is final;
+        with needs_llm, time_info is the fast path's unchecked answer (or None)
+    """
+    if not has_time_candidate(message_text):
+        return False, None
+    time_info = quick_extract(message_text)
+    if time_info is not None and fast_path:
+        return False, time_info
+    return True, time_info
+
+
+# 历史结果中的时间行，新格式为 "MM:DD:HH:MM-...:"，旧格式为单独一行时间
+TIMES = r'\d{2}:\d{2}:\d{2}:\d{2}(?:-\d{2}:\d{2}:\d{2}:\d{2})*'
+NEW_HEADER = re.compile(rf'^({TIMES}):\s*$')
+OLD_TIME_LINE = re.compile(rf'^({TIMES})\s*$')
+
+
+def load_history(pattern="output/qq_messages_analysis_*.txt", db_path="qq.db"):
+    """
+    Load (message, time_info) pairs labeled by the LLM in earlier runs
+
+    Args:
+        pattern: Glob of analysis output files
+        db_path: Database with stored extraction results
+
+    Returns:
+        Dictionary normalized message -> time information string
+    """
+    samples = {}
+
+    def add(message, time_info):
+        message = message.strip()
+        if message:
+            samples[re.sub(r'\s+', ' ', message)] = time_info
+
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        times, message_lines = [], None
+        for line in lines + ['Group: end']:
+            new_header = NEW_HEADER.match(line)
+            old_time = OLD_TIME_LINE.match(line)
+            if new_header or old_time or line.startswith(('Group:', '群组:', '-----', '=====')):
+                if times and message_lines:
+                    add('\n'.join(message_lines), '-'.join(times))
+                if new_header:
+                    times, message_lines = [new_header.group(1)], []
+                elif old_time:
+                    # 旧格式中多个时间可能分多行写出
+                    times = times + [old_time.group(1)] if message_lines is None else [old_time.group(1)]
+                    message_lines = None
+                else:
+                    times, message_lines = [], None
+            elif line.startswith(':') and times and message_lines is None:
+                # 旧格式中时间之后的 ":发送者:" 行
+                message_lines = []
+            elif message_lines is not None:
+                message_lines.append(line)
+            else:
+                # 思考过程等无关内容
+                times = []
+
+    try:
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        for message, time_info in conn.execute('SELECT message, time FROM qq'):
+            if message and time_info:
+                add(message, time_info.strip())
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Skipping {db_path}: {e}")
+
+    return samples
+
+
+def report():
+    """Print precision/recall of the pre-filter against historical LLM results"""
+    samples = load_history()
+    total = len(samples)
+    if not total:
+        print("No historical results found")
+        return
+
+    candidates = 0
+    quick_answers = 0
+    quick_exact = 0
+    quick_same_dates = 0
+    misses = []
+    wrong = []
+    for message, label in samples.items():
+        if has_time_candidate(message):
+            candidates += 1
+        else:
+            misses.append((label, message))
+        time_info = quick_extract(message)
+        if time_info is not None:
+            quick_answers += 1
+            if time_info == label:
+                quick_exact += 1
+            else:
+                wrong.append((label, time_info, message))
+            if {t[:5] for t in time_info.split('-')} == {t[:5] for t in label.split('-')}:
+                quick_same_dates += 1
+
+    print(f"Historical messages with LLM time information: {total}")
+    print(f"Candidate filter recall: {candidates}/{total} = {candidates / total:.1%}")
+    print(f"Fast path coverage: {quick_answers}/{total} = {quick_answers / total:.1%} answered without the LLM")
+    if quick_answers:
+        print(f"Fast path precision (exact match): {quick_exact}/{quick_answers} = {quick_exact / quick_answers:.1%}")
+        print(f"Fast path precision (same dates): {quick_same_dates}/{quick_answers} = {quick_same_dates / quick_answers:.1%}")
+    print("Note: the history only keeps messages the LLM answered with a time, "
+          "so the share of chatter skipped cannot be measured from it.")
+
+    # Fast path answers checked by the LLM, including the ones it answered none
+    checked = extract_cache.load_samples()
+    rejected, total = false_positives(checked)
+    print(f"\nFast path answers checked by the LLM: {total}")
+    if total:
+        agreed = sum(quick == llm for message, quick, llm in checked)
+        print(f"Fast path false positives (LLM: none): {rejected}/{total} = {rejected / total:.1%}")
+        print(f"Fast path exact match: {agreed}/{total} = {agreed / total:.1%}")
+    config = load_config() or {}
+    print(f"Fast path {'on' if fast_path_allowed(config, checked) else 'off'} "
+          f"(needs {config.get('prefilter_min_samples', 50)} samples, "
+          f"at most {config.get('prefilter_max_fp_rate', 0.05):.1%} false positives)")
+
+    for label, message in misses:
+        print(f"\n[missed] LLM: {label}\n{message[:120]}")
+    for label, time_info, message in wrong:
+        print(f"\n[differs] LLM: {label}  fast path: {time_info}\n{message[:120]}")
+    for message, quick, llm in checked:
+        if llm is None:
+            print(f"\n[false positive] LLM: none  fast path: {quick}\n{message[:120]}")
+
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact record of one parsed QQ group message
+
+Message is a NamedTuple: one tuple per message without a per-instance
+__dict__. `python qq_message.py` measures the memory per message against
+the previous parallel-list representation.
+"""
+
+import json
+from typing import NamedTuple, Optional
+
+
+class Message(NamedTuple):
+    group_id: str
+    message_id: int
+    message_seq: int
+    time: int
+    sender_id: Optional[int]
+    sender_name: str
+    text: str
+    # message_id of the message this one replies to
+    reply_id: Optional[str] = None
+    # id of a merged-forward message it contains (get_forward_msg)
+    forward_id: Optional[str] = None
+
+    @classmethod
+    def from_napcat(cls, event, group_id=None, message_seq=None, text=None):
+        """
+        Parse a NapCat message in array format
+
+        Args:
+            event: Message from get_group_msg_history or an HTTP POST report
+            group_id: Group ID, default the event's group_id
+            message_seq: Sequence number, default the event's message_seq
+            text: Message text, default the text segments joined (see segments.SegmentParser)
+
+        Returns:
+            Message, or None if the message has no text
+        """
+        sender = event.get('sender', {})
+        text_parts = []
+        reply_id = None
+        forward_id = None
+        for segment in event.get('message', []):
+            segment_type = segment.get('type')
+            data = segment.get('data', {})
+            if segment_type == 'text':
+                text_content = data.get('text', '')
+                if text_content.strip():
+                    text_parts.append(text_content.strip())
+            elif segment_type == 'reply':
+                reply_id = str(data.get('id'))
+            elif segment_type == 'forward':
+                forward_id = str(data.get('id'))
+        if text is None:
+            text = '\n'.join(text_parts)
+        if not text:
+            return None
+
+        if message_seq is None:
+            seq = event.get('message_seq', event.get('real_id', event.get('message_id')))
+            message_seq = int(seq) if seq not in (None, "") else 0
+        return cls(
+            group_id=str(group_id if group_id is not None else event.get('group_id')),
+            message_id=event.get('message_id'),
+            message_seq=message_seq,
+            time=event.get('time', 0),
+            sender_id=sender.get('user_id', event.get('user_id')),
+            sender_name=sender.get('card') or sender.get('nickname', 'Unknown User'),
+            text=text,
+            reply_id=reply_id,
+            forward_id=forward_id,
+        )
+
+    def to_json(self):
+        return json.dumps(self._asdict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls(**json.loads(text))
+
+
+def measure_memory(count=100000):
+    """
+    Compare memory per message of the parallel lists and of Message records
+
+    Synthetic NapCat messages are generated and parsed one at a time, so only
+    what the parsed representation keeps alive (texts, ids, containers) is
+    counted.
+
+    Returns:
+        Dictionary representation -> bytes per message
+    """
+    import random
+    import tracemalloc
+    from mock_napcat import make_message
+
+    def events():
+        rng = random.Random(0)
+        for seq in range(1, count + 1):
+            yield make_message('534116547', seq, rng, 1760000000 + seq)
+
+    def parallel_lists():
+        # Previous representation: four index-aligned lists per group
+        messages, senders, message_ids, message_seqs = [], [], [], []
+        for event in events():
+            record = Message.from_napcat(event, '534116547')
+            if record:
+                messages.append(record.text)
+                senders.append(record.sender_name)
+                message_ids.append(record.message_id)
+                message_seqs.append(record.message_seq)
+        return messages, senders, message_ids, message_seqs
+
+    def records():
+        return [record for record in (Message.from_napcat(event, '534116547') for event in events()) if record]
+
+    def dicts():
+        return [record._asdict() for record in records()]
+
+    def raw():
+        # What the fetcher held per message before parsing
+        return list(events())
+
+    results = {}
+    tracemalloc.start()
+    for name, build in (('parallel_lists_4_fields', parallel_lists),
+                        ('message_records_9_fields', records),
+                        ('dict_per_message_9_fields', dicts),
+                        ('raw_napcat_message', raw)):
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        results[name] = (tracemalloc.get_traced_memory()[0] - before) / count
+        del kept
+    tracemalloc.stop()
+    return results
+
+
+if __name__ == "__main__":
+    for name, size in measure_memory().items():
+        print(f"{name:<32}{size:>8.0f} bytes/message")
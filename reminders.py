@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deadline-driven reminder scheduler
+
+Every parsed deadline gets one reminder per lead time in REMIND_LEADS
+(e.g. 24h,3h,30m before it). Pending reminders sit in a min-heap ordered by
+fire time; the scheduler thread sleeps until the earliest one is due, and
+newly stored deadlines are pushed in through datebase.insert_hooks, so the
+table is scanned only once at startup.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+
+import datebase
+import metrics
+from send import deliver
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_leads(text):
+    """
+    Parse lead times like "24h,3h,30m"
+
+    Returns:
+        List of seconds, longest first; invalid parts are skipped
+    """
+    leads = set()
+    for part in (text or '').split(','):
+        match = re.fullmatch(r'\s*(\d+)\s*([smhd]?)\s*', part.lower())
+        if match:
+            leads.add(int(match.group(1)) * DURATION_UNITS[match.group(2) or 'm'])
+    return sorted(leads, reverse=True)
+
+
+def format_lead(seconds):
+    """Human readable time left, e.g. 3小时 or 30分钟"""
+    if seconds >= 86400 and seconds % 86400 == 0:
+        return f"{seconds // 86400}天"
+    if seconds >= 3600:
+        hours, minutes = divmod(seconds // 60, 60)
+        return f"{hours}小时{minutes}分钟" if minutes else f"{hours}小时"
+    return f"{max(1, seconds // 60)}分钟"
+
+
+class ReminderScheduler:
+    """Min-heap of (fire_at, deadline, qq_id, lead, message) with a sleeping worker thread"""
+
+    def __init__(self, config, leads=None):
+        self.config = config
+        self.leads = leads if leads is not None else parse_leads(config.get('remind_leads'))
+        self.heap = []
+        # (qq_id, deadline, lead) already queued, so a deadline is never queued twice
+        self.scheduled = set()
+        # (qq_id, deadline) seen by push, refresh() only queues the others
+        self.known = set()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def push(self, qq_id, deadline, message, now, catch_up=False):
+        """
+        Queue the reminders of one deadline
+
+        Reminders whose fire time has passed are skipped, except with catch_up
+        (a newly announced deadline, or one loaded after downtime): then the
+        shortest passed lead still before the deadline fires right away.
+
+        Returns:
+            Number of queued reminders
+        """
+        queued = 0
+        missed = None
+        self.known.add((qq_id, deadline))
+        for lead in self.leads:
+            key = (qq_id, deadline, lead)
+            if key in self.scheduled:
+                continue
+            fire_at = deadline - lead
+            if fire_at > now:
+                heapq.heappush(self.heap, (fire_at, deadline, qq_id, lead, message))
+                self.scheduled.add(key)
+                queued += 1
+            elif deadline > now:
+                missed = lead
+        if catch_up and missed is not None and (qq_id, deadline, missed) not in self.scheduled:
+            heapq.heappush(self.heap, (now, deadline, qq_id, missed, message))
+            self.scheduled.add((qq_id, deadline, missed))
+            queued += 1
+        return queued
+
+    def load(self):
+        """
+        Queue the reminders of all future deadlines in the database
+
+        With catch_up, a reminder whose fire time passed while the process was
+        down still fires once; the send ledger skips it if it was delivered.
+        """
+        now = int(time.time())
+        with self.condition:
+            queued = sum(self.push(qq_id, deadline, message, now, catch_up=True)
+                         for qq_id, deadline, message in datebase.iter_deadlines(now))
+            metrics.set_gauge('reminders_pending', len(self.heap))
+            self.condition.notify()
+        logging.info(f"Reminder scheduler loaded {queued} reminders, leads {[format_lead(lead) for lead in self.leads]}")
+
+    def refresh(self):
+        """
+        Queue the deadlines stored by other processes since the last look
+
+        The insert hooks only see deadlines stored in this process; backfill.py
+        or a manual `python work.py` write to the database directly.
+        """
+        now = int(time.time())
+        with self.condition:
+            self.known = {key for key in self.known if key[1] > now}
+            queued = sum(self.push(qq_id, deadline, message, now, catch_up=True)
+                         for qq_id, deadline, message in datebase.iter_deadlines(now)
+                         if (qq_id, deadline) not in self.known)
+            metrics.set_gauge('reminders_pending', len(self.heap))
+            self.condition.notify()
+        if queued:
+            logging.info(f"Queued {queued} reminders for deadlines stored by another process")
+
+    def set_leads(self, leads):
+        """Replace the lead times (REMIND_LEADS reload) and queue the reminders again"""
+        with self.condition:
+            self.leads = leads
+            self.heap = []
+            self.scheduled.clear()
+            self.known.clear()
+        self.load()
+
+    def add(self, deadlines):
+        """Insert hook: queue the reminders of newly stored deadlines [(qq_id, deadline, message), ...]"""
+        now = int(time.time())
+        with self.condition:
+            queued = sum(self.push(qq_id, deadline, message, now, catch_up=True)
+                         for qq_id, deadline, message in deadlines)
+            metrics.set_gauge('reminders_pending', len(self.heap))
+            # Wake the worker in case the new reminder is the earliest
+            self.condition.notify()
+        if queued:
+            logging.info(f"Queued {queued} reminders for {len(deadlines)} new deadlines")
+
+    def pop_due(self):
+        """Block until reminders are due, return them (empty list once stopped)"""
+        with self.condition:
+            while not self.stopped:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                delay = self.heap[0][0] - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                due = []
+                now = time.time()
+                while self.heap and self.heap[0][0] <= now:
+                    entry = heapq.heappop(self.heap)
+                    self.scheduled.discard((entry[2], entry[1], entry[3]))
+                    due.append(entry)
+                metrics.set_gauge('reminders_pending', len(self.heap))
+                return due
+            return []
+
+    def fire(self, due):
+        """Deliver all reminders due at the same time, each (deadline, lead) at most once"""
+        items = []
+        for fire_at, deadline, qq_id, lead, message in sorted(due, key=lambda entry: entry[1]):
+            left = max(0, deadline - int(time.time()))
+            # On time the lead itself reads better than 23小时59分钟
+            left = format_lead(lead if abs(left - lead) < 60 else left)
+            items.append(((qq_id, deadline, lead),
+                          f"{len(items) + 1}. 截止: {datetime.fromtimestamp(deadline).strftime('%m月%d日 %H:%M')}（还有{left}）\n   消息: {message}"))
+        with metrics.timer('remind', reminders=len(due)) as run:
+            new, delivered = deliver(items, self.config, "⏰ 截止提醒：")
+            run['items'] = delivered
+        if new < len(due):
+            logging.info(f"Skipped {len(due) - new} reminders already sent")
+        if delivered:
+            metrics.inc('reminders_sent_total', delivered)
+            logging.info(f"Sent {delivered} reminders")
+        if delivered < new:
+            metrics.inc('reminders_failed_total', new - delivered)
+            logging.error(f"Failed to send {new - delivered} reminders, queued for retry")
+
+    def run(self):
+        while True:
+            due = self.pop_due()
+            if not due:
+                return
+            try:
+                self.fire(due)
+            except Exception as e:
+                logging.error(f"Reminder failed: {e}")
+
+    def start(self):
+        """Load pending reminders, hook into inserts and start the worker thread"""
+        datebase.init_database()
+        datebase.insert_hooks.append(self.add)
+        self.load()
+        self.thread = threading.Thread(target=self.run, name='reminders', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.add in datebase.insert_hooks:
+            datebase.insert_hooks.remove(self.add)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rich parsing of NapCat message segments
+
+Besides plain text, deadlines arrive as merged-forward chat records, replies
+quoting an earlier notice, file names and shared cards. SegmentParser turns
+all of them into the message text in one pass over the segments:
+
+    text     kept as is
+    reply    [回复] quoted text, from the messages parsed so far or qq.db, never refetched;
+             only added as context when the reply itself has a date or time, so a
+             "收到" under a deadline notice does not repeat the notice's deadline
+    forward  [转发] node texts, inline content or get_forward_msg (memoized by id)
+    file     [文件] file name
+    json     [卡片] card title / description
+    image    [图片] OCR text via NapCat's ocr_image (IMAGE_OCR, memoized by file)
+
+One parser is shared by all groups of a run, so a forward or image reposted
+in several groups costs one API call. Its caches are LRU-bounded by
+REPLY_CACHE_SIZE, and failed API calls are not cached.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+import metrics
+from datebase import find_if_exist
+from prefilter import has_time_candidate
+from http_session import post_with_retry
+from qq_message import Message
+from simple_qq_parser import get_napcat_session
+
+# Nested forwards deeper than this are only marked
+MAX_FORWARD_DEPTH = 3
+# Quoted texts are cut to this length
+MAX_QUOTE_LENGTH = 300
+
+
+class SegmentParser:
+    """Parse NapCat messages into Message records with expanded segments"""
+
+    def __init__(self, config, reply_cache_size=None):
+        self.config = config
+        self.expand_forward = config.get('expand_forward', True)
+        self.image_ocr = config.get('image_ocr', False)
+        self.reply_cache_size = reply_cache_size or config.get('reply_cache_size', 5000)
+        # message_id -> text of recently parsed messages, for reply targets
+        self.reply_cache = OrderedDict()
+        # forward id -> list of node texts; image file -> OCR text
+        self.forward_cache = OrderedDict()
+        self.ocr_cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def call(self, action, payload):
+        """Call a NapCat action, return its data or None"""
+        api_config = self.config.get('api', {})
+        base_url = api_config.get('base_url', 'http://localhost:3001')
+        token = api_config.get('token', '1145141919810')
+        try:
+            response = post_with_retry(
+                get_napcat_session(self.config.get('fetch_concurrency', 4)),
+                f"{base_url}/{action}",
+                retries=self.config.get('fetch_retries', 2),
+                headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'},
+                json=payload,
+                timeout=api_config.get('timeout', 10)
+            )
+            response.raise_for_status()
+            result = response.json()
+        except Exception as e:
+            print(f"{action} failed: {e}")
+            return None
+        if result.get('status') != 'ok':
+            print(f"{action} failed: {result.get('message') or result.get('wording')}")
+            return None
+        return result.get('data')
+
+    def cache_put(self, cache, key, value):
+        """Add to one of the caches, evicting the least recently used entries"""
+        with self.lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.reply_cache_size:
+                cache.popitem(last=False)
+
+    def cache_get(self, cache, key):
+        """Look up a cache entry and mark it recently used, None if missing"""
+        with self.lock:
+            if key not in cache:
+                return None
+            cache.move_to_end(key)
+            return cache[key]
+
+    def remember(self, message_id, text):
+        """Add a parsed message to the reply cache, evicting the oldest"""
+        self.cache_put(self.reply_cache, str(message_id), text)
+
+    def quoted_text(self, group_id, reply_id):
+        """Text of a reply target: recently parsed messages first, then stored records"""
+        text = self.cache_get(self.reply_cache, reply_id)
+        if text is not None:
+            metrics.inc('segment_lookups_total', kind='reply', source='cache')
+            return text
+        record = find_if_exist(group_id, reply_id) if group_id else None
+        if record is not None:
+            metrics.inc('segment_lookups_total', kind='reply', source='db')
+            return record[3]
+        metrics.inc('segment_lookups_total', kind='reply', source='miss')
+        return None
+
+    def forward_texts(self, data, depth):
+        """Node texts of a merged-forward message"""
+        forward_id = str(data.get('id'))
+        texts = self.cache_get(self.forward_cache, forward_id)
+        if texts is not None:
+            metrics.inc('segment_lookups_total', kind='forward', source='cache')
+            return texts
+
+        # NapCat inlines the nodes of forwards in most reports
+        nodes = data.get('content')
+        if nodes is None:
+            metrics.inc('segment_lookups_total', kind='forward', source='api')
+            result = self.call('get_forward_msg', {'message_id': forward_id})
+            if result is None:
+                # Not cached, the next message with this forward tries again
+                return []
+            nodes = result.get('messages', [])
+        texts = []
+        for node in nodes or []:
+            segments = node.get('message') or node.get('content') or []
+            if isinstance(segments, str):
+                text = segments.strip()
+            else:
+                text = self.segments_text(segments, None, depth + 1)
+            if text:
+                texts.append(text)
+
+        self.cache_put(self.forward_cache, forward_id, texts)
+        return texts
+
+    def ocr_text(self, data):
+        """OCR text of an image, through NapCat's ocr_image"""
+        image = data.get('url') or data.get('file')
+        if not image:
+            return None
+        text = self.cache_get(self.ocr_cache, image)
+        if text is not None:
+            return text
+        metrics.inc('segment_lookups_total', kind='image', source='api')
+        result = self.call('ocr_image', {'image': image})
+        if result is None:
+            return None
+        if isinstance(result, dict):
+            result = result.get('texts', [])
+        # An image without text is cached as ''
+        text = ' '.join(item.get('text', '') for item in result or [] if item.get('text')).strip()
+        self.cache_put(self.ocr_cache, image, text)
+        return text or None
+
+    def segments_text(self, segments, group_id, depth=0):
+        """Build the text of a message from all of its segments"""
+        parts = []
+        quote = None
+        for segment in segments:
+            segment_type = segment.get('type')
+            data = segment.get('data', {})
+            if segment_type == 'text':
+                text = data.get('text', '').strip()
+                if text:
+                    parts.append(text)
+            elif segment_type == 'reply':
+                quoted = self.quoted_text(group_id, str(data.get('id')))
+                if quoted:
+                    quote = f"[回复] {quoted[:MAX_QUOTE_LENGTH]}"
+            elif segment_type == 'forward':
+                if self.expand_forward and depth < MAX_FORWARD_DEPTH:
+                    texts = self.forward_texts(data, depth)
+                    if texts:
+                        parts.append("[转发]\n" + '\n'.join(texts))
+            elif segment_type == 'file':
+                name = data.get('name') or data.get('file')
+                if name:
+                    parts.append(f"[文件] {name}")
+            elif segment_type == 'json':
+                title = card_title(data.get('data'))
+                if title:
+                    parts.append(f"[卡片] {title}")
+            elif segment_type == 'image' and self.image_ocr:
+                text = self.ocr_text(data)
+                if text:
+                    parts.append(f"[图片] {text}")
+        # The quote only resolves a date or time in the reply itself ("改到这周五"),
+        # otherwise the reply would carry the quoted notice's deadline again
+        if quote and has_time_candidate('\n'.join(parts)):
+            parts.insert(0, quote)
+        return '\n'.join(parts)
+
+    def parse(self, event, group_id=None, message_seq=None):
+        """
+        Parse a NapCat message with all of its segments
+
+        Args:
+            event: Message from get_group_msg_history or an HTTP POST report
+            group_id: Group ID, default the event's group_id
+            message_seq: Sequence number, default from the event
+
+        Returns:
+            Message, or None if nothing readable is left
+        """
+        group_id = str(group_id if group_id is not None else event.get('group_id'))
+        text = self.segments_text(event.get('message', []), group_id)
+        if not text:
+            return None
+        self.remember(event.get('message_id'), text)
+        return Message.from_napcat(event, group_id, message_seq, text)
+
+
+def card_title(raw):
+    """Title and description of a shared card (json segment)"""
+    try:
+        card = json.loads(raw) if isinstance(raw, str) else (raw or {})
+    except ValueError:
+        return None
+    parts = []
+    for detail in (card.get('meta') or {}).values():
+        if isinstance(detail, dict):
+            for key in ('title', 'desc'):
+                if detail.get(key) and detail[key] not in parts:
+                    parts.append(str(detail[key]))
+    if not parts and card.get('prompt'):
+        parts.append(str(card['prompt']))
+    return ' '.join(parts) or None
@@ -1,8 +1,10 @@
+import json
 import requests
 from loadconfig import load_config
 import logging
-from datebase import iter_data
-from datetime import datetime
+from datebase import iter_due, session, init_database, claim_reminders, enqueue_send, get_send, due_sends, mark_sent, mark_failed, drop_send, lease_send
+from datetime import datetime, timedelta
+import metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,6 +15,9 @@ logging.basicConfig(
     ]
 )
 
+# A posting attempt holds its queue row this long; longer than any request timeout
+SEND_LEASE_SECONDS = 300
+
 
 def send(message,config):
     """
@@ -50,13 +55,183 @@ def send(message,config):
         }
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
-        response.raise_for_status()
+        with metrics.timer('send', length=len(message)):
+            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            response.raise_for_status()
         return response.json()
     except Exception as e:
         print(f"Request failed for group {config.get('send_id')}: {e}")
         return None
 
+def post_forward(texts, config):
+    """
+    Send one forward message with one node per text to SEND_ID
+    
+    Args:
+        texts: Node texts
+        config: Configuration dictionary
+        
+    Returns:
+        None on success, otherwise the error text
+    """
+    api_config = config.get('api', {})
+    base_url = api_config.get('base_url', 'http://localhost:3000')
+    token = api_config.get('token', '1145141919810')
+    
+    payload = {
+        "user_id": config.get('send_id'),
+        "messages": [
+            {
+                "type": "node",
+                "data": {
+                    "nickname": "DDL提醒",
+                    "content": [{"type": "text", "data": {"text": text}}]
+                }
+            }
+            for text in texts
+        ],
+        "news": [],
+        "prompt": "textValue",
+        "summary": "textValue",
+        "source": "textValue"
+    }
+    try:
+        response = requests.post(
+            f"{base_url}/send_private_forward_msg",
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'},
+            json=payload,
+            timeout=api_config.get('timeout', 10)
+        )
+        response.raise_for_status()
+        result = response.json()
+    except Exception as e:
+        return str(e)
+    if result.get('status') != 'ok':
+        return result.get('message') or result.get('wording') or f"retcode {result.get('retcode')}"
+    return None
+
+def chunk_items(texts, header, node_chars=1000, nodes_per_message=20):
+    """
+    Pack reminder texts into forward messages of bounded size
+    
+    Texts are packed greedily into nodes of at most node_chars characters
+    (a longer text is cut), and nodes into messages of at most
+    nodes_per_message nodes. Every message starts with the header, which
+    counts against nodes_per_message.
+    
+    Args:
+        texts: List of (key, text); key is passed through to the result
+        header: First line of every message
+        node_chars: Maximum characters per node
+        nodes_per_message: Maximum nodes per forward message
+        
+    Returns:
+        List of (node_texts, keys) per message
+    """
+    nodes = []
+    current, current_keys = [], []
+    for key, text in texts:
+        if len(text) > node_chars:
+            text = text[:node_chars - 1] + '…'
+        if current and sum(len(part) + 2 for part in current) + len(text) > node_chars:
+            nodes.append(('\n\n'.join(current), current_keys))
+            current, current_keys = [], []
+        current.append(text)
+        current_keys.append(key)
+    if current:
+        nodes.append(('\n\n'.join(current), current_keys))
+    
+    messages = []
+    # One node of every message is the header
+    per_message = max(1, nodes_per_message - 1)
+    count = (len(nodes) + per_message - 1) // per_message
+    for index in range(count):
+        chunk = nodes[index * per_message:(index + 1) * per_message]
+        title = header if count == 1 else f"{header}（{index + 1}/{count}）"
+        messages.append(([title] + [text for text, keys in chunk], [key for text, keys in chunk for key in keys]))
+    return messages
+
+def attempt_send(queue_id, config):
+    """
+    Try to deliver one queued message, reschedule it with backoff on failure
+    
+    Returns:
+        True if the message was delivered
+    """
+    now = int(datetime.now().timestamp())
+    # Only the holder of the lease posts, a concurrent retry task or check_all skips the row
+    with session():
+        row = get_send(queue_id) if lease_send(queue_id, now, SEND_LEASE_SECONDS) else None
+    if row is None:
+        return False
+    queue_id, recipient, nodes, expires_at, attempts = row
+    if expires_at is not None and expires_at < now:
+        drop_send(queue_id)
+        metrics.inc('send_expired_total')
+        logging.error(f"Dropped queued message {queue_id} after {attempts} attempts, all its deadlines passed")
+        return False
+    
+    with metrics.timer('send', queue_id=queue_id, attempt=attempts + 1) as run:
+        error = post_forward(json.loads(nodes), config)
+        run['items'] = 1
+    if error is None:
+        mark_sent(queue_id)
+        metrics.inc('send_delivered_total')
+        return True
+    
+    delay = min(config.get('send_retry_base', 60) * 2 ** attempts, config.get('send_retry_max', 3600))
+    mark_failed(queue_id, now + delay, error)
+    metrics.inc('send_failures_total')
+    logging.error(f"Sending message {queue_id} failed ({error}), retry in {delay}s")
+    return False
+
+def deliver(items, config, header):
+    """
+    Deliver reminders exactly once per (deadline, lead time, recipient)
+    
+    Reminders already in the ledger are skipped. The rest are packed into
+    forward messages (SEND_NODE_CHARS, SEND_NODES_PER_MESSAGE), which are
+    written to the send queue before the first attempt, so a failed or
+    interrupted send is retried by retry_pending, also after a restart.
+    
+    Args:
+        items: List of ((qq_id, deadline, lead), text)
+        config: Configuration dictionary
+        header: First line of every message
+        
+    Returns:
+        (new, delivered): number of reminders not sent before, and of those delivered now
+    """
+    recipient = config.get('send_id')
+    with session():
+        claimed = set(claim_reminders([key for key, text in items], recipient))
+        messages = chunk_items(
+            [(key, text) for key, text in items if key in claimed],
+            header,
+            config.get('send_node_chars', 1000),
+            config.get('send_nodes_per_message', 20)
+        )
+        queue_ids = [
+            (enqueue_send(recipient, json.dumps(texts, ensure_ascii=False), max(key[1] for key in keys), keys), len(keys))
+            for texts, keys in messages
+        ]
+    # The queue rows are committed before anything is sent
+    delivered = sum(count for queue_id, count in queue_ids if attempt_send(queue_id, config))
+    return len(claimed), delivered
+
+def retry_pending(config=None):
+    """
+    Retry queued messages whose backoff has elapsed
+    
+    Returns:
+        Number of delivered messages
+    """
+    config = config or load_config()
+    if config is None:
+        return 0
+    init_database()
+    return sum(attempt_send(queue_id, config) for queue_id in due_sends(int(datetime.now().timestamp())))
+
 def check_all():
     try:
         config = load_config()
@@ -65,74 +240,42 @@ def check_all():
             return
         
         logging.info("Send task started")
+        init_database()
         
-        # Get data from database
-        data = iter_data()
+        # Reminder window: today 00:00 until the end of the day remind_days from now
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = int(today.timestamp())
+        end = int((today + timedelta(days=config.get('remind_days', 1) + 1)).timestamp())
         
-        if not data:
-            message_content = "datebase is empty"
-            logging.info("datebase is empty")
-        else:
-            # Get current date and next day date
-            from datetime import datetime, timedelta
-            today = datetime.now().date()
-            tomorrow = today + timedelta(days=1)
-            
-            # Build message content
-            message_content = "今日时间信息汇总：\n\n"
-            filtered_messages = []
-            
-            for record in data:
-                message_time_str = record[4]  # Time field
-                if message_time_str:
-                    message_time_str = message_time_str.strip()
-                    try:
-                        # Parse time string (format: MM:DD:HH:MM)
-                        if '-' in message_time_str:
-                            time_parts_list = message_time_str.split('-')
-                            for time_parts in time_parts_list:
-                                if len(time_parts) >= 2:
-                                    time_parts = time_parts.split(':')
-                                    month = int(time_parts[0])
-                                    day = int(time_parts[1])
-                                    current_year = datetime.now().year
-                                    message_date = datetime(current_year, month, day).date()
-                                    if message_date >= today and message_date <= tomorrow:
-                                        filtered_messages.append(record)
-                                        break
-                        else:
-                            time_parts = message_time_str.split(':')
-                            if len(time_parts) >= 2:
-                                month = int(time_parts[0])
-                                day = int(time_parts[1])
-                                
-                                # Construct date (assuming current year)
-                                current_year = datetime.now().year
-                                message_date = datetime(current_year, month, day).date()
-                                
-                                # Check if it's yesterday or today
-                                if message_date >= today and message_date <= tomorrow:
-                                    filtered_messages.append(record)
-                    except (ValueError, IndexError) as e:
-                        logging.warning(f"Invalid time format: {message_time_str}")
-                        continue
-            
-            if filtered_messages:
-                for i, record in enumerate(filtered_messages, 1):  
-                    message_content += f"{i}. 时间: {record[4]}\n   消息: {record[3]}\n\n"
-            else:
-                message_content = "今日暂无符合条件的时间信息数据"
-                logging.info("No messages found for today or yesterday")
+        # Get only records with a deadline in the window, the whole job uses one connection
+        metrics.configure(config)
+        with session(), metrics.timer('due_lookup') as run:
+            filtered_messages = iter_due(start, end)
+            run['items'] = len(filtered_messages)
+        
+        if not filtered_messages:
+            logging.info("No messages found for today or tomorrow")
+            result = send("今日暂无符合条件的时间信息数据", config)
+            if not result:
+                logging.error("Send task failed")
+            metrics.write_prometheus()
+            return
         
-        # Send message
-        result = send(message_content, config)
-        print(result)
-        if result:
-            logging.info("Send task completed")
+        # The digest reminds a deadline once per day left. Its ledger leads are
+        # negative (-1 on the day, -2 one day before ...), so they never collide
+        # with the lead times of reminders.py
+        items = []
+        for i, record in enumerate(filtered_messages, 1):
+            days_left = (datetime.fromtimestamp(record[5]).date() - today.date()).days
+            items.append(((record[0], record[5], -1 - days_left), f"{i}. 时间: {record[4]}\n   消息: {record[3]}"))
+        new, delivered = deliver(items, config, "今日时间信息汇总：")
+        if new == delivered:
+            logging.info(f"Send task completed, {delivered} reminders sent, {len(items) - new} already sent before")
         else:
-            logging.error("Send task failed")
+            logging.error(f"Send task: {new - delivered} of {new} reminders queued for retry")
+        metrics.write_prometheus()
             
     except Exception as e:
         logging.error(f"Send task error: {e}")
 if __name__ == "__main__":
-    check_all()
\ No newline at end of file
+    check_all()
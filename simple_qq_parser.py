@@ -7,16 +7,35 @@ Only outputs text content and sender nickname
 
 import requests
 import json
+import threading
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from loadconfig import load_config
+from datebase import get_cursor
+from http_session import create_session, post_with_retry
+import metrics
+from qq_message import Message
 
+# Shared keep-alive session for NapCat requests
+napcat_session = None
+napcat_session_lock = threading.Lock()
+
+
+def get_napcat_session(pool_size=10):
+    """Get the shared NapCat session, create it on first use"""
+    global napcat_session
+    
+    with napcat_session_lock:
+        if napcat_session is None:
+            napcat_session = create_session(pool_size)
+        return napcat_session
 
 
 
 
-def get_group_messages(group_id, count, config):
+
+def get_group_messages(group_id, count, config, message_seq=""):
     """
     Get group message history
     
@@ -24,6 +43,7 @@ def get_group_messages(group_id, count, config):
         group_id: Group ID
         count: Number of messages to fetch
         config: Configuration dictionary
+        message_seq: Fetch messages up to this seq, "" for the latest messages
     """
     api_config = config.get('api', {})
     base_url = api_config.get('base_url', 'http://localhost:3001')
@@ -39,15 +59,25 @@ def get_group_messages(group_id, count, config):
     
     payload = {
         "group_id": group_id,
-        "message_seq": "",
+        "message_seq": message_seq,
         "count": count,
         "reverseOrder": False
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
-        response.raise_for_status()
-        return response.json()
+        with metrics.timer('fetch', group_id=group_id) as run:
+            response = post_with_retry(
+                get_napcat_session(config.get('fetch_concurrency', 4)),
+                url,
+                retries=config.get('fetch_retries', 2),
+                headers=headers,
+                json=payload,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            run['items'] = len((result.get('data') or {}).get('messages', []))
+        return result
     except requests.exceptions.ConnectionError as e:
         print(f"连接错误 - 无法连接到 {base_url}: {e}")
         return None
@@ -62,99 +92,160 @@ def get_group_messages(group_id, count, config):
         return None
 
 
-def parse_text_only(api_response):
+def message_seq_of(message):
+    """Get the sequence number NapCat orders a group's messages by"""
+    seq = message.get('message_seq', message.get('real_id', message.get('message_id')))
+    return int(seq) if seq not in (None, "") else 0
+
+
+class IncompleteFetch(Exception):
     """
-    Parse API response, extract only text content and sender nickname
+    Older pages could not be fetched down to the cursor, messages in between are missing
     
-    Args:
-        api_response: API response data
+    oldest is the oldest message_seq reached: everything from it up to the
+    newest message was yielded, the messages between the cursor and it were not.
     """
-    if not api_response or api_response.get('status') != 'ok':
-        print("API response error")
-        return []
     
-    messages = api_response.get('data', {}).get('messages', [])
+    def __init__(self, message, oldest):
+        super().__init__(message)
+        self.oldest = oldest
+
+
+def iter_new_pages(group_id, count, config, cursor_seq=None, before_seq=None):
+    """
+    Fetch the messages of a group newer than its cursor, one page at a time
     
-    print(f"=== Group Message Text Content ({len(messages)} messages) ===\n")
+    The latest count messages are fetched first. If all of them are newer
+    than the cursor, older pages are fetched until the cursor is reached,
+    so nothing is lost between runs of a busy group. Only one page is held
+    in memory at a time.
     
-    message_list = []
-    sender_list = []
-    message_id_list = []
-    for message in messages:
-        # Get sender info
-        sender = message.get('sender', {})
-        message_id = message.get('message_id')
-        message_time = message.get('time')
-        sender_name = sender.get('card', sender.get('nickname', 'Unknown User'))
+    Args:
+        group_id: Group ID
+        count: Number of messages in the first request
+        config: Configuration dictionary
+        cursor_seq: message_seq of the last processed message, None on the first run
+        before_seq: Start below this message_seq instead of at the newest
+            message, to continue a catch-up that stopped there
         
-        # Extract text content
-        message_parts = message.get('message', [])
-        text_parts = []
+    Yields:
+        Lists of new messages, newest page first, each page in ascending order
         
-        for msg_part in message_parts:
-            if msg_part.get('type') == 'text':
-                text_content = msg_part.get('data', {}).get('text', '')
-                if text_content.strip():
-                    text_parts.append(text_content.strip())
+    Raises:
+        IncompleteFetch: after the last page, when an older page failed or
+            MAX_FETCH_PAGES was reached before the cursor; the messages between
+            the cursor and IncompleteFetch.oldest were not fetched
+    """
+    page_size = config.get('fetch_page_size', 50)
+    max_pages = config.get('max_fetch_pages', 20)
+    if before_seq is None:
+        response = get_group_messages(group_id, count, config)
+        requested = count
+    else:
+        response = get_group_messages(group_id, page_size, config, message_seq=before_seq)
+        requested = page_size
+    if not response or response.get('status') != 'ok':
+        return
+    
+    page = response.get('data', {}).get('messages', [])
+    pages = 1
+    new_count = 0
+    # Oldest seq already yielded, older pages overlap by one message
+    oldest = before_seq
+    incomplete = None
+    
+    while True:
+        new = sorted(
+            (message for message in page
+             if (cursor_seq is None or message_seq_of(message) > cursor_seq)
+             and (oldest is None or message_seq_of(message) < oldest)),
+            key=message_seq_of
+        )
+        if new:
+            new_count += len(new)
+            yield new
+        if cursor_seq is None or not page:
+            break
+        page_oldest = min(message_seq_of(message) for message in page)
+        if page_oldest <= cursor_seq or len(page) < requested:
+            # Reached the cursor or the beginning of the history
+            break
+        if oldest is not None and page_oldest >= oldest:
+            # No older messages
+            break
+        if pages >= max_pages:
+            incomplete = f"stopped after {pages} pages before reaching seq {cursor_seq}"
+            break
+        oldest = page_oldest
+        older = get_group_messages(group_id, page_size, config, message_seq=oldest)
+        if not older or older.get('status') != 'ok':
+            incomplete = f"failed to fetch messages before seq {oldest}"
+            break
+        page = older.get('data', {}).get('messages', [])
+        requested = page_size
+        pages += 1
+    print(f"Group {group_id}: {new_count} new messages in {pages} requests")
+    if incomplete:
+        raise IncompleteFetch(f"Group {group_id}: {incomplete}, seq {cursor_seq} to {page_oldest} "
+                              f"left for the next run", page_oldest)
+
+
+def iter_text_messages(messages, group_id=None, parser=None):
+    """
+    Parse NapCat messages into compact records, skipping messages without text
+    
+    Args:
+        messages: NapCat messages in array format
+        group_id: Group ID of the messages
+        parser: segments.SegmentParser expanding replies, forwards, files and
+            cards; None keeps only the text segments
         
-        # Output if has text content
-        if text_parts:
-            text_content = '\n'.join(text_parts)
-            
-            # Format message
-            formatted_message = text_content
-            message_id_list.append(message_id)
-            sender_list.append(sender_name)
-            message_list.append(formatted_message)
-    return message_list, sender_list, message_id_list
-
-
-def get_and_parse_messages(config_file="config.env"):
+    Yields:
+        Message records
+    """
+    parse = parser.parse if parser is not None else Message.from_napcat
+    for message in messages:
+        record = parse(message, group_id, message_seq_of(message))
+        if record is not None:
+            yield record
+
+
+def parse_text_only(api_response, group_id=None, parser=None):
     """
-    Main function to get and parse messages from configured groups
+    Parse API response, extract only messages with text content
     
     Args:
-        config_file: Path to configuration file
+        api_response: API response data
+        group_id: Group ID of the messages
+        parser: Optional segments.SegmentParser
         
     Returns:
-        Dictionary with group results
+        List of Message records in response order
     """
-    config = load_config(config_file)
-    if not config:
-        return {}
+    if not api_response or api_response.get('status') != 'ok':
+        print("API response error")
+        return []
     
-    groups = config.get('groups', [])
-    results = {}
+    messages = api_response.get('data', {}).get('messages', [])
     
-    print("Fetching group messages...")
+    print(f"=== Group Message Text Content ({len(messages)} messages) ===\n")
     
-    for group in groups:
-        group_id = group.get('group_id')
-        group_name = group.get('group_name', f'Group {group_id}')
-        message_count = group.get('message_count', 20)
-        
-        print(f"\n=== Processing {group_name} (ID: {group_id}) ===")
-        
-        # Get messages
-        response = get_group_messages(group_id, message_count, config)
-        
-        if response:
-            # Parse and output text content
-            message_list, sender_list, message_id_list = parse_text_only(response)
-            results[group_id] = {
-                'group_name': group_name,
-                'messages': message_list,
-                'senders': sender_list,
-                'message_ids': message_id_list
-            }
-        else:
-            print(f"Failed to get messages for group {group_name}")
-            results[group_id] = {
-                'group_name': group_name,
-                'messages': []
-            }
-    
-    return results
+    return list(iter_text_messages(messages, group_id, parser))
+
 
 if __name__ == "__main__":
-   print(get_and_parse_messages())
\ No newline at end of file
+    # Print the new messages of every group; nothing is extracted and no cursor moves
+    # (work.py runs the pipeline). Imported here, segments depends on this module
+    from segments import SegmentParser
+    config = load_config()
+    if config:
+        parser = SegmentParser(config)
+        for group in config.get('groups', []):
+            group_id = group.get('group_id')
+            cursor = get_cursor(group_id)
+            try:
+                for page in iter_new_pages(group_id, group.get('message_count', 20), config, cursor[0] if cursor else None):
+                    for record in iter_text_messages(page, group_id, parser):
+                        print(record)
+            except IncompleteFetch as e:
+                print(e)
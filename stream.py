@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Real-time message ingestion from NapCat HTTP POST reporting
+
+NapCat posts every event to STREAM_HOST:STREAM_PORT. Group messages of the
+configured GROUP_IDS are queued and extracted continuously in small
+micro-batches through the same path as the nightly batch job, which keeps
+running as a fallback for anything missed while the stream was down.
+
+In NapCat, add an "HTTP client" (HTTP POST reporting) network config pointing
+to http://<host>:<STREAM_PORT>/ with message format "array".
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import llm
+from loadconfig import load_config, reload_hooks
+from simple_qq_parser import parse_text_only, message_seq_of
+from work import process_results
+from datebase import init_database, get_cursor
+from segments import SegmentParser
+
+# Incoming group message events
+event_queue = None
+# Segment parser of the stream worker, its reply cache spans micro-batches
+parser = None
+
+
+class EventHandler(BaseHTTPRequestHandler):
+    """Receive NapCat HTTP POST reports"""
+
+    config = {}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        # NapCat signs reports with HMAC-SHA1 when a secret is configured
+        secret = self.config.get('stream_secret')
+        if secret:
+            expected = 'sha1=' + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+            if not hmac.compare_digest(expected, self.headers.get('X-Signature', '')):
+                self.send_response(403)
+                self.end_headers()
+                return
+
+        try:
+            event = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+
+        group_ids = {group['group_id'] for group in self.config.get('groups', [])}
+        if (event.get('post_type') == 'message' and event.get('message_type') == 'group'
+                and str(event.get('group_id')) in group_ids):
+            try:
+                event_queue.put(event, timeout=5)
+            except queue.Full:
+                # The gap keeps the group's cursor in place, the batch job fetches it
+                logging.warning(f"Stream queue full, dropped message {event.get('message_id')} of group {event.get('group_id')}")
+                self.send_response(503)
+                self.end_headers()
+                return
+
+        # 204: no quick operation for NapCat
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def contiguous_seq(cursor_seq, seqs):
+    """
+    Last seq reached from the cursor without a gap
+
+    The stream may only move a group's cursor over messages it has seen
+    itself: after downtime, a restart, a dropped report or a full queue the
+    first streamed seq is beyond cursor + 1, and the cursor stays for the
+    batch job to fetch the gap.
+
+    Args:
+        cursor_seq: Current cursor of the group, None if never fetched
+        seqs: Sorted message_seq values of the batch
+
+    Returns:
+        New cursor seq, or None to leave the cursor alone
+    """
+    if cursor_seq is None:
+        return None
+    last = None
+    expected = cursor_seq + 1
+    for seq in seqs:
+        if seq < expected:
+            continue
+        if seq != expected:
+            break
+        last = seq
+        expected += 1
+    return last
+
+
+def build_results(events):
+    """
+    Group queued events into the results structure of work.process_results
+
+    Args:
+        events: List of NapCat group message events
+
+    Returns:
+        Dictionary group_id -> group result
+    """
+    by_group = {}
+    for event in events:
+        by_group.setdefault(str(event.get('group_id')), []).append(event)
+
+    results = {}
+    for group_id, group_events in by_group.items():
+        group_events.sort(key=message_seq_of)
+        records = parse_text_only({'status': 'ok', 'data': {'messages': group_events}}, group_id, parser)
+        cursor = get_cursor(group_id)
+        seqs = [message_seq_of(event) for event in group_events]
+        last_seq = contiguous_seq(cursor[0] if cursor else None, seqs)
+        last_message_id = group_events[seqs.index(last_seq)].get('message_id') if last_seq is not None else None
+        results[group_id] = {
+            'group_name': f'Group {group_id}',
+            'messages': records,
+            'last_seq': last_seq,
+            'last_message_id': last_message_id
+        }
+    return results
+
+
+def run_worker(config, stop_event):
+    """
+    Drain the event queue in micro-batches
+
+    A batch is processed when it has STREAM_BATCH_SIZE messages or
+    STREAM_FLUSH_SECONDS after its first message arrived.
+    """
+    batch_size = config.get('stream_batch_size', 16)
+    flush_seconds = config.get('stream_flush_seconds', 5)
+
+    while not stop_event.is_set():
+        try:
+            events = [event_queue.get(timeout=1)]
+        except queue.Empty:
+            continue
+        deadline = time.time() + flush_seconds
+        while len(events) < batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                events.append(event_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            stored = process_results(build_results(events), config)
+            logging.info(f"Stream batch: {len(events)} messages, {stored} records stored")
+        except Exception as e:
+            logging.error(f"Stream batch failed: {e}")
+
+
+def start_stream(config):
+    """
+    Start the report server and the extraction worker in background threads
+
+    Args:
+        config: Configuration dictionary
+
+    Returns:
+        (server, stop_event): call server.shutdown() and stop_event.set() to stop
+    """
+    global event_queue, parser
+
+    init_database()
+    # The worker extracts around the clock, the nightly job must not unload its model
+    llm.keep_loaded = True
+    parser = SegmentParser(config)
+    event_queue = queue.Queue(maxsize=config.get('stream_queue_size', 1000))
+    EventHandler.config = config
+    # GROUP_IDS and STREAM_SECRET edits apply to the next report
+    reload_hooks.append(lambda old, new: setattr(EventHandler, 'config', new))
+    server = ThreadingHTTPServer((config.get('stream_host', '127.0.0.1'), config.get('stream_port', 8081)), EventHandler)
+    stop_event = threading.Event()
+
+    threading.Thread(target=server.serve_forever, name='stream-server', daemon=True).start()
+    threading.Thread(target=run_worker, args=(config, stop_event), name='stream-worker', daemon=True).start()
+    logging.info(f"Stream ingestion listening on {server.server_address[0]}:{server.server_address[1]}")
+    return server, stop_event
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = load_config()
+    if config is None:
+        logging.error("Config error, cannot start")
+    else:
+        server, stop_event = start_stream(config)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            stop_event.set()
+            server.shutdown()
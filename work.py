@@ -1,83 +1,409 @@
-from simple_qq_parser import get_and_parse_messages
-from llm import extract_time_info, unload_model, extract_time_info_by_api
+from simple_qq_parser import iter_new_pages, iter_text_messages, message_seq_of, IncompleteFetch
+from segments import SegmentParser
+import llm
+import extract_cache
+from prefilter import prefilter, fast_path_allowed
+from loadconfig import load_config
 from datetime import datetime
 import os
-from datebase import find_if_exist, insert_data, remove_data, iter_data, init_database
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from datebase import find_if_exist, insert_many, iter_data, init_database, session, get_cursor, set_cursor, get_gap, set_gap
 def check(group_id, message_id):
     return not find_if_exist(group_id, message_id)
 
+def find_new(group_id, message_ids):
+    """Indexes of the fetched messages not yet in the database"""
+    return [i for i, message_id in enumerate(message_ids) if check(group_id, message_id)]
+
+# Marks a message whose extraction failed, so the result is not cached
+FAILED = object()
+
+def extract_messages(messages, config):
+    """
+    Extract time information: rule-based pre-filter, then extraction cache, then the LLM
+    
+    Args:
+        messages: List of message texts
+        config: Configuration dictionary
+        
+    Returns:
+        List of extracted time information strings (None if no time information,
+        FAILED if the LLM call failed), same order as input
+    """
+    # Rule-based fast path: no date-like token, or an unambiguous absolute date
+    answers = {}
+    # Fast path answers sent to the LLM to measure its false positives
+    unchecked = {}
+    if config.get('prefilter', True):
+        with metrics.timer('prefilter') as run:
+            fast_path = fast_path_allowed(config)
+            for index, message in enumerate(messages):
+                needs_llm, time_info = prefilter(message, fast_path)
+                if not needs_llm:
+                    answers[index] = time_info
+                elif time_info is not None:
+                    unchecked[index] = time_info
+            run['items'] = len(messages)
+            run['answered'] = len(answers)
+        print(f"Pre-filter: {len(answers)} of {len(messages)} messages answered without the LLM"
+              + ("" if fast_path else f", fast path off, {len(unchecked)} of its answers checked by the LLM"))
+    llm_indexes = [index for index in range(len(messages)) if index not in answers]
+    llm_messages = [messages[index] for index in llm_indexes]
+    
+    prompt = llm.load_prompt()
+    # EXTRACT_BACKEND, imported on first use
+    backend = llm.get_backend(config.get('extract_backend'))
+    with metrics.timer('cache_lookup') as run:
+        keys = [extract_cache.cache_key(prompt, backend.model_id(config), message) for message in llm_messages]
+        cached = extract_cache.lookup_many(keys)
+        run['items'] = len(keys)
+        run['hits'] = len(cached)
+    
+    # Only one LLM call for identical messages (reposts across groups)
+    misses = {}
+    for key, message in zip(keys, llm_messages):
+        if key not in cached and key not in misses:
+            misses[key] = message
+    print(f"Extraction cache: {len(llm_messages) - len(misses)} of {len(llm_messages)} messages answered from cache")
+    
+    miss_keys = list(misses)
+    # One extraction at a time, the stream worker and the nightly job share the model
+    with llm.extract_lock, metrics.timer('llm', backend=backend.__name__) as run:
+        miss_infos = backend.extract_batch(list(misses.values()), config, on_error=FAILED)
+        run['items'] = len(miss_infos)
+        run['failed'] = sum(time_info is FAILED for time_info in miss_infos)
+    extracted = dict(zip(miss_keys, miss_infos))
+    extract_cache.store_many(
+        [(key, time_info) for key, time_info in extracted.items() if time_info is not FAILED],
+        config.get('cache_max_entries', 50000)
+    )
+    extract_cache.log_stats()
+    
+    cached.update(extracted)
+    for index, key in zip(llm_indexes, keys):
+        answers[index] = cached[key]
+    extract_cache.store_samples([
+        (messages[index], time_info, answers[index])
+        for index, time_info in unchecked.items() if answers[index] is not FAILED
+    ])
+    return [answers[index] for index in range(len(messages))]
+
+def process_results(results, config, f=None):
+    """
+    Extract and store the new messages of fetched groups
+    
+    Shared by the nightly batch job and the real-time stream worker.
+    
+    Args:
+        results: Dictionary group_id -> {'group_name', 'messages', 'last_seq', 'last_message_id'}
+            (see stream.build_results)
+        config: Configuration dictionary
+        f: Optional output file for the analysis results
+        
+    Returns:
+        Number of stored records
+    """
+    stored = 0
+    # Run the whole job on one connection, committed once at the end
+    with session():
+        # Collect new messages of all groups, so they are extracted in parallel
+        new_indexes = {}
+        pending = []
+        with metrics.timer('dedup') as run:
+            for group_id, group_data in results.items():
+                new_indexes[group_id] = find_new(group_id, [record.message_id for record in group_data['messages']])
+                pending.extend(group_data['messages'][i].text for i in new_indexes[group_id])
+            run['items'] = sum(len(group_data['messages']) for group_data in results.values())
+            run['new'] = len(pending)
+        
+        time_infos = extract_messages(pending, config)
+        
+        position = 0
+        for group_id, group_data in results.items():
+            group_name = group_data['group_name']
+            message_count = len(group_data['messages'])
+            
+            print(f"\n=== Processing Group: {group_name} ({message_count} messages) ===")
+            if f:
+                f.write(f"Group: {group_name}\n")
+                f.write("-"*40 + "\n")
+            # Write results in message order within the group
+            rows = []
+            first_failed_seq = None
+            for i in new_indexes[group_id]:
+                time_info = time_infos[position]
+                position += 1
+                if time_info is FAILED:
+                    print(f"\n--- Message {i} --- extraction failed, will retry next run")
+                    if first_failed_seq is None:
+                        first_failed_seq = group_data['messages'][i].message_seq
+                    continue
+                record = group_data['messages'][i]
+                message_id, message = record.message_id, record.text
+                print(f"\n--- Message {i} ---")
+                print("Original message:")
+                print(message)
+                if time_info is not None:
+                    result_line = f"{time_info}:\n{message}"
+                    print(result_line)
+                    if f:
+                        f.write(f"{result_line}\n")
+                    rows.append((group_id, message_id, message, time_info))
+                else:
+                    print("No time information detected")
+                print("\n" + "="*50)
+            with metrics.timer('store', group_id=group_id) as run:
+                insert_many(rows)
+                run['items'] = len(rows)
+            stored += len(rows)
+            
+            if group_data.get('last_seq') is not None:
+                advance_cursor(group_id, group_data['last_seq'], group_data['last_message_id'], first_failed_seq)
+    return stored
+
+def advance_cursor(group_id, last_seq, last_message_id, first_failed_seq=None):
+    """Move a group's cursor forward, but not past a message whose extraction failed"""
+    current = (get_cursor(group_id) or (0,))[0] or 0
+    if first_failed_seq is None:
+        if last_seq > current:
+            set_cursor(group_id, last_seq, last_message_id)
+    elif first_failed_seq - 1 > current:
+        set_cursor(group_id, first_failed_seq - 1, None)
+
+def commit_records(group_id, records, config, first_failed, f=None):
+    """
+    Deduplicate, extract and store one chunk of a group's message records
+    
+    Args:
+        group_id: Group ID
+        records: Message records of the group
+        config: Configuration dictionary
+        first_failed: Dictionary group_id -> lowest message_seq whose extraction failed, updated in place
+        f: Optional output file for the analysis results
+        
+    Returns:
+        Number of stored records
+    """
+    with session():
+        with metrics.timer('dedup', group_id=group_id) as run:
+            new = [records[i] for i in find_new(group_id, [record.message_id for record in records])]
+            run['items'] = len(records)
+            run['new'] = len(new)
+        
+        time_infos = extract_messages([record.text for record in new], config)
+        
+        rows = []
+        for record, time_info in zip(new, time_infos):
+            if time_info is FAILED:
+                first_failed[group_id] = min(first_failed.get(group_id, record.message_seq), record.message_seq)
+            elif time_info is not None:
+                result_line = f"{time_info}:\n{record.text}"
+                print(result_line)
+                if f:
+                    f.write(f"{result_line}\n")
+                rows.append((group_id, record.message_id, record.text, time_info))
+        with metrics.timer('store', group_id=group_id) as run:
+            insert_many(rows)
+            run['items'] = len(rows)
+    print(f"Group {group_id}: {len(records)} messages, {len(new)} new, {len(rows)} with time information")
+    return len(rows)
+
+def put_page(pages, item, stop):
+    """Put into the bounded queue, give up once the consumer has stopped"""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def fetch_group_pages(group, config, cursor, pages, parser=None, stop=None, gap=None):
+    """
+    Pipeline producer: fetch and parse the new pages of one group
+    
+    A group too far behind for MAX_FETCH_PAGES gets its newest pages now and
+    a gap (low_seq, high_seq) of messages still to be fetched. Later runs
+    continue the gap below the cursor, MAX_FETCH_PAGES more pages each, until
+    it is closed.
+    
+    Puts (group_id, Message records, None) for every page and (group_id, None,
+    (newest_message, complete, gap)) when the group is done, blocking while the
+    queue is full. complete is False if the new messages did not reach the
+    cursor. Stops early once stop is set.
+    """
+    stop = stop or threading.Event()
+    group_id = group.get('group_id')
+    cursor_seq = cursor[0] if cursor else None
+    newest = None
+    complete = True
+    new_gap = gap
+    
+    def emit(page):
+        with metrics.timer('parse', group_id=group_id) as run:
+            records = list(iter_text_messages(page, group_id, parser))
+            run['items'] = len(records)
+        return put_page(pages, (group_id, records, None), stop)
+    
+    try:
+        try:
+            for page in iter_new_pages(group_id, group.get('message_count', 20), config, cursor_seq):
+                if stop.is_set():
+                    return
+                if newest is None:
+                    newest = page[-1]
+                if not emit(page):
+                    return
+        except IncompleteFetch as e:
+            # The newest pages are committed, the messages down to the cursor
+            # (and an older gap) become one gap for the next runs
+            print(e)
+            complete = False
+            new_gap = (gap[0] if gap else cursor_seq, e.oldest)
+        if complete and gap is not None:
+            print(f"Group {group_id}: continuing the catch-up of seq {gap[0]} to {gap[1]}")
+            try:
+                for page in iter_new_pages(group_id, group.get('message_count', 20), config, gap[0], before_seq=gap[1]):
+                    if stop.is_set() or not emit(page):
+                        return
+                new_gap = None
+            except IncompleteFetch as e:
+                print(e)
+                new_gap = (gap[0], e.oldest)
+    except Exception as e:
+        print(f"Fetching group {group_id} failed: {e}")
+        # Do not move the cursor over pages that were never fetched
+        newest, new_gap = None, gap
+    finally:
+        put_page(pages, (group_id, None, (newest, complete, new_gap)), stop)
+
+def run_pipeline(config, f=None):
+    """
+    Stream new messages of all groups through fetch -> parse -> dedup -> extract -> store
+    
+    Groups are fetched page by page in parallel (FETCH_CONCURRENCY) into a
+    bounded queue of PIPELINE_QUEUE_PAGES pages. The main thread extracts and
+    commits each group's records every PIPELINE_CHUNK_SIZE messages, so memory
+    stays bounded and results reach the database while older pages are still
+    being fetched. A group's cursor moves once all its pages are committed.
+    
+    Args:
+        config: Configuration dictionary
+        f: Optional output file for the analysis results
+        
+    Returns:
+        (message_count, stored): number of new text messages and of stored records
+    """
+    groups = config.get('groups', [])
+    group_names = {group.get('group_id'): group.get('group_name', f"Group {group.get('group_id')}") for group in groups}
+    chunk_size = config.get('pipeline_chunk_size', 256)
+    # Read cursors once before fetching, producers only get them passed in
+    cursors = {group.get('group_id'): get_cursor(group.get('group_id')) for group in groups}
+    gaps = {group.get('group_id'): get_gap(group.get('group_id')) for group in groups}
+    pages = queue.Queue(maxsize=max(1, config.get('pipeline_queue_pages', 8)))
+    # Shared by all groups, so reposted forwards are fetched once
+    parser = SegmentParser(config)
+    pending = {group.get('group_id'): [] for group in groups}
+    first_failed = {}
+    message_count = 0
+    stored = 0
+    # Group whose results the output file is currently listing
+    written_group = None
+    
+    def commit(group_id):
+        nonlocal written_group
+        if f and written_group != group_id:
+            f.write(f"Group: {group_names[group_id]}\n")
+            f.write("-"*40 + "\n")
+            written_group = group_id
+        records, pending[group_id] = pending[group_id], []
+        return commit_records(group_id, records, config, first_failed, f)
+    
+    print("Fetching group messages...")
+    # Set when the consumer leaves, so producers blocked on a full queue exit
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max(1, config.get('fetch_concurrency', 4))) as executor:
+        for group in groups:
+            group_id = group.get('group_id')
+            executor.submit(fetch_group_pages, group, config, cursors[group_id], pages, parser, stop, gaps[group_id])
+        
+        try:
+            remaining = len(groups)
+            while remaining:
+                group_id, records, done = pages.get()
+                if records is not None:
+                    message_count += len(records)
+                    pending[group_id].extend(records)
+                    if len(pending[group_id]) >= chunk_size:
+                        stored += commit(group_id)
+                    continue
+                
+                # Group done: commit the rest, then move its cursor
+                remaining -= 1
+                if pending[group_id]:
+                    stored += commit(group_id)
+                newest, complete, gap = done
+                with session():
+                    if first_failed.get(group_id) is None:
+                        if newest is not None:
+                            advance_cursor(group_id, message_seq_of(newest), newest.get('message_id'))
+                        if gap != gaps[group_id]:
+                            set_gap(group_id, gap)
+                    elif complete and newest is not None:
+                        advance_cursor(group_id, message_seq_of(newest), newest.get('message_id'), first_failed[group_id])
+                    # Otherwise cursor and gap stay, the next run fetches the failed messages again
+        finally:
+            stop.set()
+            # Free the queue so no producer waits on it, cursors of unfinished groups stay put
+            while True:
+                try:
+                    pages.get_nowait()
+                except queue.Empty:
+                    break
+    return message_count, stored
+
 def work():
     # Initialize database first
     init_database()
     
-    # Get messages from all configured groups
-    results = get_and_parse_messages()
+    config = load_config() or {}
+    metrics.configure(config)
+    run_start = time.perf_counter()
     
     # Create output filename (with timestamp)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = f"output/qq_messages_analysis_{timestamp}.txt"
+    message_count = 0
     
-    if results:
-        print(f"\n=== Summary: Processed {len(results)} groups ===")
+    if config.get('groups'):
         print(f"Output will be saved to: {output_file}")
         
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(f"QQ Group Message Time Information Extraction Results\n")
-            f.write(f"Number of groups processed: {len(results)}\n")
+            f.write(f"Number of groups processed: {len(config['groups'])}\n")
             f.write("="*60 + "\n\n")
-            
-            for group_id, group_data in results.items():
-                group_name = group_data['group_name']
-                message_count = len(group_data['messages'])
-                
-                print(f"\n=== Processing Group: {group_name} ({message_count} messages) ===")
-                f.write(f"Group: {group_name}\n")
-                f.write("-"*40 + "\n")
-                # Binary search for first non-existent message
-                l, r = 0, message_count - 1
-                ans = message_count  # Default to start from the end, skip if all exist
-                
-                while l <= r:
-                    mid = (l + r) // 2
-                    if check(group_id, group_data['message_ids'][mid]):
-                        # Current message doesn't exist, record position and continue searching left
-                        ans = mid
-                        r = mid - 1
-                    else:
-                        # Current message exists, search right
-                        l = mid + 1
-                for i in range(ans, message_count):
-                    message_id, sender_name, message = group_data['message_ids'][i], group_data['senders'][i], group_data['messages'][i]
-                    print(f"\n--- Message {i} ---")
-                    print("Original message:")
-                    print(message)
-                    try:
-                        # time_info = extract_time_info(message)
-                        time_info = extract_time_info_by_api(message)
-                        if time_info is not None:
-                            result_line = f"{time_info}:\n{message}"
-                            print(result_line)
-                            f.write(f"{result_line}\n")
-                            insert_data(group_id, message_id, message, time_info)
-                        else:
-                            print("No time information detected")
-                    except Exception as e:
-                        error_msg = f"Time extraction failed: {e}"
-                        print(error_msg)
-                    print("\n" + "="*50)
+            # Stream messages of all configured groups page by page
+            message_count, stored = run_pipeline(config, f)
         
+        print(f"\n=== Summary: {message_count} new messages in {len(config['groups'])} groups, {stored} records stored ===")
         print(f"\nAnalysis completed! Results saved to: {output_file}")
         
     else:
         print("No groups processed")
     
-    # Release model, free GPU memory
-    print("Releasing model from GPU...")
-    unload_model()
+    # Release the model of a local backend, free GPU memory (not while the stream worker uses it)
+    llm.unload_backends()
+    
+    metrics.record('work', time.perf_counter() - run_start, message_count)
+    metrics.write_prometheus()
 def see_data():
     data = iter_data()
     for i in data:
         print(i)
 if __name__ == "__main__":
     work()
-    see_data()
\ No newline at end of file
+    see_data()